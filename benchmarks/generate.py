@@ -0,0 +1,97 @@
+"""Generates synthetic schedules for benchmarks.
+
+Usage: python -m benchmarks.generate NAME DIR [--topics N] [--periods N] ...
+"""
+import argparse
+import random
+from datetime import datetime, timedelta
+
+import goals
+import helpers
+import history
+import schedule
+import timer
+
+WORDS = ["read", "write", "chapter", "exercise", "review", "notes", "paper", "project",
+         "lecture", "summary", "draft", "test", "slides", "code", "refactor", "plan"]
+
+
+def _text(rng: random.Random, n_words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(n_words))
+
+
+def generate(name: str, root_dir: str, topics: int = 10, goals_per_topic: int = 20, periods: int = 50,
+             entries_per_period: int = 200, todo_items: int = 10, seed: int = 0) -> None:
+    """Saves a synthetic schedule with schedule._save.
+
+    Parameters
+    ----------
+    name
+        Name of schedule.
+    root_dir
+        Directory schedule is saved in.
+    topics
+        Number of topics.
+    goals_per_topic
+        Number of open goals of each topic.
+    periods
+        Number of periods in history, including the current one.
+    entries_per_period
+        Number of work entries in each period. Additionally a goal is marked
+        as done in each period for every tenth work entry.
+    todo_items
+        Number of goals on todo-list.
+    seed
+        Seed of random number generator.
+    """
+    rng = random.Random(seed)
+    topic_names = [f"topic{i}" for i in range(topics)]
+    to_work = {topic: float(rng.randint(1, 20)) for topic in topic_names}
+    remaining = {topic: 0.0 for topic in topic_names}
+    goals_ = {"Period": goals.GoalList()}
+    for topic in topic_names:
+        goals_[topic] = goals.GoalList(
+            goals.Goal(f"goal{j}", _text(rng, rng.randint(5, 60)), rng.random() < 0.2)
+            for j in range(goals_per_topic))
+
+    history_ = []
+    start = datetime(2020, 1, 1)
+    for idx in range(periods):
+        period_start = start + timedelta(days=7 * idx)
+        with helpers.frozen_clock(period_start):
+            period = history.Period()
+        for jdx in range(entries_per_period):
+            with helpers.frozen_clock(period_start + timedelta(minutes=jdx * 7 * 24 * 60 // entries_per_period)):
+                period.add_entry(history.WorkEntry(rng.choice(topic_names), round(rng.uniform(0.25, 4), 2)))
+                if jdx % 10 == 0:
+                    period.add_entry(history.GoalDoneEntry(
+                        rng.choice(topic_names), f"done{idx}_{jdx}", _text(rng, 10), False))
+        history_.append(period)
+
+    todo = []
+    for _ in range(min(todo_items, topics * goals_per_topic)):
+        topic = rng.choice(topic_names)
+        goal = rng.choice(goals_[topic]).name
+        if (topic, goal) not in todo:
+            todo.append((topic, goal))
+
+    schedule._save(name, to_work, remaining, goals_, timer.Timer(), history_, todo, root_dir=root_dir)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("name", type=str)
+    parser.add_argument("root_dir", type=str)
+    parser.add_argument("--topics", type=int, default=10)
+    parser.add_argument("--goals-per-topic", type=int, default=20)
+    parser.add_argument("--periods", type=int, default=50)
+    parser.add_argument("--entries-per-period", type=int, default=200)
+    parser.add_argument("--todo-items", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    generate(args.name, args.root_dir, args.topics, args.goals_per_topic, args.periods,
+             args.entries_per_period, args.todo_items, args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""Measures startup of `terminal_interface.py work <topic>`.
+
+Each tree (the working tree and optionally a git revision to compare
+against) is copied to a temporary directory with its own schedule, so
+real schedules are never touched. Import times are taken from
+`python -X importtime`.
+
+Usage: python -m benchmarks.startup [--baseline REV] [--runs N]
+"""
+import argparse
+import io
+import json
+import shutil
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+from pathlib import Path
+
+TOP_DIR = Path(__file__).absolute().parent.parent
+
+CREATE_SCHEDULE = (
+    "import sys, history, schedule, timer; "
+    "schedule._save('bench', {'Bench': 10.0}, {'Bench': 0.0}, {'Period': [], 'Bench': []}, "
+    "timer.Timer(), [history.Period()], [], root_dir=sys.argv[1])"
+)
+
+
+def _copy_working_tree(dest: Path) -> None:
+    shutil.copytree(TOP_DIR / "workschedule", dest / "workschedule",
+                    ignore=shutil.ignore_patterns("__pycache__", "*.sock"))
+
+
+def _copy_revision(rev: str, dest: Path) -> None:
+    archive = subprocess.run(["git", "archive", "--format=tar", rev, "workschedule"],
+                             cwd=TOP_DIR, capture_output=True, check=True).stdout
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        tar.extractall(dest)
+
+
+def _prepare(tree: Path) -> None:
+    (tree / "schedules").mkdir()
+    (tree / "curr_schedule").write_text("bench")
+    subprocess.run([sys.executable, "-c", CREATE_SCHEDULE, str(tree / "schedules")],
+                   cwd=tree / "workschedule", check=True)
+
+
+def _parse_importtime(stderr: str) -> dict:
+    """Returns cumulative import time in ms of each top level import."""
+    imports = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not name.startswith("  "):  # nested imports are indented
+            imports[name.strip()] = int(cumulative) / 1000
+    return imports
+
+
+def measure(tree: Path, runs: int) -> dict:
+    walls = []
+    import_totals = []
+    imports = {}
+    for _ in range(runs):
+        tic = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "terminal_interface.py", "work", "Bench", "0.1"],
+            cwd=tree / "workschedule", capture_output=True, text=True)
+        walls.append((time.perf_counter() - tic) * 1000)
+        if proc.returncode != 0:
+            raise RuntimeError(proc.stderr)
+        imports = _parse_importtime(proc.stderr)
+        import_totals.append(sum(imports.values()))
+    slowest = sorted(imports.items(), key=lambda item: item[1], reverse=True)[:10]
+    return {
+        "wall_ms": statistics.median(walls),
+        "import_ms": statistics.median(import_totals),
+        "slowest_imports_ms": dict(slowest),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--baseline", type=str, default=None,
+                        help="git revision to compare working tree against")
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        trees = {"current": Path(tmp_dir) / "current"}
+        _copy_working_tree(trees["current"])
+        if args.baseline is not None:
+            trees["baseline"] = Path(tmp_dir) / "baseline"
+            _copy_revision(args.baseline, trees["baseline"])
+        for label, tree in trees.items():
+            _prepare(tree)
+            results[label] = measure(tree, args.runs)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""Times schedule operations on synthetic schedules of different sizes.
+
+Results are printed (or written to --output) as JSON, so runs of
+different releases can be compared.
+
+Usage: python -m benchmarks.suite [--sizes small medium large] [--repeats N] [--storage MODE]
+                                  [--output FILE]
+"""
+import argparse
+import json
+import platform
+import statistics
+import tempfile
+import time
+
+from benchmarks.generate import generate
+
+import helpers
+import schedule
+
+SIZES = {
+    "small": dict(topics=5, goals_per_topic=10, periods=10, entries_per_period=50, todo_items=5),
+    "medium": dict(topics=10, goals_per_topic=50, periods=100, entries_per_period=200, todo_items=20),
+    "large": dict(topics=20, goals_per_topic=500, periods=500, entries_per_period=500, todo_items=50),
+}
+NAME = "bench"
+LINE_LENGTH = 60
+
+
+def _time(func, repeats: int, setup=None) -> dict:
+    """Returns timings of func in ms, setup is called before each call and not timed."""
+    timings = []
+    for idx in range(repeats):
+        if setup is not None:
+            setup()
+        tic = time.perf_counter()
+        func(idx)
+        timings.append((time.perf_counter() - tic) * 1000)
+    return {"median_ms": statistics.median(timings), "min_ms": min(timings), "max_ms": max(timings)}
+
+
+def run_size(params: dict, repeats: int, storage: str = "pickle") -> dict:
+    results = {}
+    with tempfile.TemporaryDirectory() as root_dir:
+        generate(NAME, root_dir, **params)
+        # convert to the current on-disk layout once, so later loads measure the steady state
+        schedule.load(NAME, root_dir)
+        schedule.set_storage(storage)
+        schedule._search_index()  # build search index, so it is stored
+        schedule.save(NAME, root_dir)
+
+        load = lambda: schedule.load(NAME, root_dir)
+        topic = "topic0"
+        results["load"] = _time(lambda idx: load(), repeats)
+        results["save"] = _time(lambda idx: schedule.save(NAME, root_dir), repeats, setup=load)
+        results["overview"] = _time(lambda idx: schedule.overview(), repeats, setup=load)
+        schedule.overview()
+        schedule.save(NAME, root_dir)  # stores rendered overview
+        results["overview_cached"] = _time(lambda idx: schedule.overview(), repeats, setup=load)
+        results["topic_overview"] = _time(lambda idx: schedule.topic_overview(topic, LINE_LENGTH), repeats,
+                                          setup=load)
+        results["add_goal"] = _time(lambda idx: schedule.add_goal(topic, f"new_goal{idx}", "description", False),
+                                    repeats, setup=load)
+        results["search"] = _time(lambda idx: schedule.search("chapter review"), repeats, setup=load)
+        load()
+        results["mark_done"] = _time(lambda idx: schedule.mark_done(topic, schedule._goals[topic][0].name),
+                                     min(repeats, len(schedule._goals[topic])))
+        results["reset"] = _time(lambda idx: schedule.reset(list(schedule._to_work)), repeats, setup=load)
+
+        load()
+        descriptions = [goal.description for goals_ in schedule._goals.values() for goal in goals_]
+        results["split_lines"] = _time(
+            lambda idx: [helpers.split_lines(text, LINE_LENGTH - 4) for text in descriptions], repeats)
+        results["cutoff"] = _time(
+            lambda idx: [helpers.cutoff(text, LINE_LENGTH // 2) for text in descriptions], repeats)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=str, nargs="+", default=["small", "medium"], choices=list(SIZES))
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--storage", type=str, default="pickle", choices=schedule.STORAGE_MODES)
+    parser.add_argument("--output", type=str, default=None)
+    args = parser.parse_args()
+
+    results = {
+        "python": platform.python_version(),
+        "repeats": args.repeats,
+        "storage": args.storage,
+        "sizes": {size: {"params": SIZES[size], "timings": run_size(SIZES[size], args.repeats, args.storage)}
+                  for size in args.sizes},
+    }
+    text = json.dumps(results, indent=2)
+    if args.output is None:
+        print(text)
+    else:
+        with open(args.output, "wt") as file:
+            file.write(text)
+
+
+if __name__ == '__main__':
+    main()
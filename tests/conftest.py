@@ -0,0 +1,7 @@
+import os
+import sys
+
+# modules of workschedule import each other as top level modules
+WORKSCHEDULE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "workschedule")
+if WORKSCHEDULE_DIR not in sys.path:
+    sys.path.insert(0, WORKSCHEDULE_DIR)
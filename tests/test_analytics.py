@@ -0,0 +1,11 @@
+"""Statistics over periods, see `analytics`."""
+import pytest
+
+np = pytest.importorskip("numpy")
+import analytics
+
+
+def test_total_is_unknown_if_all_topics_are_unknown():
+    matrix = np.array([[np.nan, np.nan], [1.0, np.nan], [3.0, 1.0]])
+    total = analytics.text_report(["m", "a"], matrix).splitlines()[0]
+    assert total == "total  ▁█ mean 2.50 last 4.00"
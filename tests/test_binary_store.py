@@ -0,0 +1,115 @@
+"""Binary schedule format, see `binary_store`."""
+import os
+import struct
+
+import pytest
+
+import binary_store
+import goals
+import history
+import schedule
+import timer
+
+NAME = "binary"
+
+
+def _period(start: int, closed: bool = True) -> history.Period:
+    period = history.Period(start)
+    period.add_entry(history.WorkEntry("math", 1.5, start + 60))
+    period.add_entry(history.WorkEntry("art", 0.5, start + 90000))
+    period.add_entry(history.GoalDoneEntry("math", "proof", "write it down", True, start + 120))
+    period.add_entry(history.GoalFailEntry("art", "sketch", "", False, start + 180))
+    if closed:
+        period.close({"math": 3.0, "art": 1.0}, {"math": 1.5, "art": 0.5})
+    return period
+
+
+def _state() -> list:
+    goals_ = {"Period": goals.GoalList(), "math": goals.GoalList(), "art": goals.GoalList()}
+    goals_["math"].add(goals.Goal("lemma", "prove lemma ü", False, 1700000000))
+    goals_["art"].add(goals.Goal("paint", "", True))
+    work_timer = timer.Timer()
+    work_timer.start("math")
+    history_ = history.LazyHistory([_period(1600000000), _period(1600600000, closed=False)])
+    return [{"math": 3.0, "art": 1.0}, {"math": 1.5, "art": -0.5}, goals_, work_timer, history_,
+            [("math", "lemma")], {"period_days": 7}, goals.deadline_heap(goals_)]
+
+
+def _goals(goals_: dict) -> dict:
+    return {topic: [(goal.name, goal.description, goal.periodic, goal.deadline) for goal in goal_list]
+            for topic, goal_list in goals_.items()}
+
+
+def test_round_trip():
+    state = _state()
+    decoded = binary_store.decode(binary_store.encode(*state))
+
+    to_work, remaining, goals_, work_timer, history_, todo, settings, deadlines = decoded
+    assert (to_work, remaining, todo, settings, deadlines) == (state[0], state[1], state[5], state[6], state[7])
+    assert _goals(goals_) == _goals(state[2])
+    assert work_timer.topic == "math"
+    assert abs(work_timer.tic.timestamp() - state[3].tic.timestamp()) < 1e-3
+    assert len(history_) == 2
+    for period, expected in zip(history_, state[4]):
+        assert vars(period) == vars(expected)
+
+
+def test_period_round_trip():
+    period = _period(1600000000)
+    assert vars(binary_store.decode_period(binary_store.encode_period(period))) == vars(period)
+    summary = history.PeriodSummary(period)
+    assert vars(binary_store.decode_period(binary_store.encode_period(summary))) == vars(summary)
+
+
+def test_nul_in_string_is_rejected():
+    state = _state()
+    state[2]["math"].add(goals.Goal("bad\0name", "", False))
+    with pytest.raises(binary_store.FormatException):
+        binary_store.encode(*state)
+
+
+def test_newer_format_is_rejected():
+    data = bytearray(binary_store.encode(*_state()))
+    struct.pack_into("<H", data, len(binary_store.MAGIC), binary_store.VERSION + 1)
+    with pytest.raises(binary_store.FormatException):
+        binary_store.decode(bytes(data))
+
+
+def _version_1(data: bytes, offsets: list, starts: list) -> bytes:
+    """Returns schedule data of format version 2 as written by format version 1, whose
+    history section contains the positions of archived periods instead of an index."""
+    _, sections = binary_store._sections(data)
+    parts = [binary_store.MAGIC, struct.pack("<H", 1)]
+    for tag, (offset, length) in sections.items():
+        payload = data[offset:offset + length]
+        if tag == binary_store.HISTORY:
+            payload = struct.pack("<II", 0, len(offsets)) + struct.pack(f"<{len(offsets)}q", *offsets) \
+                + struct.pack(f"<{len(starts)}q", *starts)
+        parts.append(binary_store._section(tag, payload))
+    return b"".join(parts)
+
+
+@pytest.mark.parametrize("n_archived", [0, 2])
+def test_version_1_is_read_and_converted(tmp_path, n_archived):
+    root_dir = str(tmp_path)
+    archived = [_period(1600000000 + idx * 600000) for idx in range(n_archived)]
+    offsets = []
+    with open(os.path.join(root_dir, f"{NAME}.history"), "wb") as file:
+        for period in archived:
+            offsets.append(file.tell())
+            binary_store.write_record(file, period)
+    state = _state()
+    state[4] = history.LazyHistory([_period(1602000000, closed=False)])
+    state[6], state[7] = {}, []  # neither start periods nor fail goals on load
+    with open(os.path.join(root_dir, f"{NAME}.schedule"), "wb") as file:
+        file.write(_version_1(binary_store.encode(*state), offsets, [period.start for period in archived]))
+
+    schedule.load(NAME, root_dir)
+    assert schedule._storage == "binary"
+    assert [vars(period) for period in schedule._history] == [vars(period) for period in archived + state[4].periods]
+    schedule.save(NAME, root_dir)
+
+    with open(os.path.join(root_dir, f"{NAME}.schedule"), "rb") as file:
+        assert binary_store._sections(file.read())[0] == binary_store.VERSION
+    schedule.load(NAME, root_dir)
+    assert [vars(period) for period in schedule._history] == [vars(period) for period in archived + state[4].periods]
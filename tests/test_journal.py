@@ -0,0 +1,107 @@
+"""Journal storage mode, see `journal` and `schedule.save`."""
+import os
+import pickle
+
+import pytest
+
+import goals
+import helpers
+import history
+import journal
+import schedule
+import timer
+
+NAME = "journaled"
+
+
+def _new_schedule(root_dir: str) -> str:
+    """Saves a schedule in journal mode and returns path of its journal file."""
+    schedule._save(NAME, {"math": 4.0}, {"math": 0.0}, {"Period": goals.GoalList(), "math": goals.GoalList()},
+                   timer.Timer(), [history.Period()], [], root_dir=root_dir)
+    schedule.load(NAME, root_dir)
+    schedule.set_storage("journal")
+    schedule.save(NAME, root_dir)
+    return os.path.join(root_dir, f"{NAME}.journal")
+
+
+def _hours() -> list:
+    return [entry.hours for entry in schedule._history[-1].work_entries]
+
+
+def test_operations_are_replayed(tmp_path):
+    root_dir = str(tmp_path)
+    journal_path = _new_schedule(root_dir)
+    schedule.load(NAME, root_dir)
+    schedule.work("math", 1.0)
+    schedule.add_goal("math", "proof", "", False)
+    schedule.save(NAME, root_dir)
+    schedule.load(NAME, root_dir)
+    schedule.mark_done("math", "proof")
+    schedule.save(NAME, root_dir)
+
+    records, end = journal.read(journal_path)
+    assert [record[0] for record in records] == ["work", "add_goal", "mark_done"]
+    assert end == os.path.getsize(journal_path)
+    schedule.load(NAME, root_dir)
+    assert schedule._storage == "journal"
+    assert _hours() == [1.0]
+    assert len(schedule._goals["math"]) == 0
+    assert [entry.goal_name for entry in schedule._history[-1].goal_entries] == ["proof"]
+
+
+def _journal_with_records(root_dir: str) -> bytes:
+    journal_path = _new_schedule(root_dir)
+    schedule.load(NAME, root_dir)
+    for hours in [1.0, 2.0, 3.0]:
+        schedule.work("math", hours)
+        schedule.save(NAME, root_dir)
+    with open(journal_path, "rb") as file:
+        return file.read()
+
+
+def test_read_stops_at_torn_record(tmp_path):
+    data = _journal_with_records(str(tmp_path))
+    path = str(tmp_path / "torn.journal")
+    complete = []
+    for cut in range(len(data) + 1):
+        with open(path, "wb") as file:
+            file.write(data[:cut])
+        records, end = journal.read(path)
+        assert [record[1] for record in records] == [("math", hours) for hours in [1.0, 2.0, 3.0][:len(records)]]
+        assert end <= cut
+        if end == cut and len(records) > 0:
+            complete.append(len(records))
+    assert complete == [1, 2, 3]
+
+
+@pytest.mark.parametrize("cut", range(1, 60, 7))
+def test_save_after_torn_record(tmp_path, cut):
+    root_dir = str(tmp_path)
+    data = _journal_with_records(root_dir)
+    with open(os.path.join(root_dir, f"{NAME}.journal"), "wb") as file:
+        file.write(data[:len(data) - cut])
+
+    schedule.load(NAME, root_dir)
+    replayed = _hours()
+    assert replayed == [1.0, 2.0, 3.0][:len(replayed)]
+    for hours in [10.0, 20.0]:
+        schedule.work("math", hours)
+        schedule.save(NAME, root_dir)
+        schedule.load(NAME, root_dir)
+    assert _hours() == replayed + [10.0, 20.0]
+
+
+def test_journal_of_pickled_records_is_read(tmp_path):
+    root_dir = str(tmp_path)
+    journal_path = _new_schedule(root_dir)
+    with open(journal_path, "wb") as file:
+        pickle.dump(("work", ("math", 1.0), {}, helpers.now()), file)
+        file.write(b"\x80\x04torn")
+
+    schedule.load(NAME, root_dir)
+    assert _hours() == [1.0]
+    schedule.work("math", 2.0)
+    schedule.save(NAME, root_dir)  # writes a snapshot, journal file is in old format
+    assert journal.read(journal_path) == ([], 0)
+    schedule.load(NAME, root_dir)
+    assert _hours() == [1.0, 2.0]
@@ -0,0 +1,92 @@
+"""Saves of a schedule by several processes, see `schedule.save`."""
+import os
+import subprocess
+import sys
+from datetime import datetime, time, timedelta
+
+import pytest
+
+import goals
+import helpers
+import history
+import schedule
+import timer
+from conftest import WORKSCHEDULE_DIR
+
+NAME = "shared"
+
+
+def _save_in_other_process(root_dir: str, code: str) -> None:
+    subprocess.run([sys.executable, "-c", f"import sys; sys.path.insert(0, {WORKSCHEDULE_DIR!r})\n"
+                    f"import schedule\nschedule.load({NAME!r}, {root_dir!r})\n{code}\n"
+                    f"schedule.save({NAME!r}, {root_dir!r})"], check=True)
+
+
+def _new_schedule(root_dir: str, storage: str) -> None:
+    schedule._save(NAME, {"math": 1.0}, {"math": 0.0}, {"Period": goals.GoalList(), "math": goals.GoalList()},
+                   timer.Timer(), [history.Period()], [], root_dir=root_dir)
+    schedule.load(NAME, root_dir)
+    schedule.set_storage(storage)
+    schedule.save(NAME, root_dir)
+
+
+def _version(root_dir: str) -> int:
+    with open(os.path.join(root_dir, f"{NAME}.lock"), "rb") as file:
+        return int(file.read())
+
+
+@pytest.mark.parametrize("storage", schedule.STORAGE_MODES)
+def test_operations_of_both_processes_are_saved(tmp_path, storage):
+    root_dir = str(tmp_path)
+    _new_schedule(root_dir, storage)
+    version = _version(root_dir)
+
+    schedule.load(NAME, root_dir)
+    _save_in_other_process(root_dir, "schedule.work('math', 1.0)\nschedule.add_goal('math', 'proof', '', False)")
+    schedule.work("math", 2.0)
+    schedule.save(NAME, root_dir)  # reloads schedule and applies operations again
+    assert _version(root_dir) == version + 2
+
+    schedule.load(NAME, root_dir)
+    assert schedule._storage == storage
+    assert [entry.hours for entry in schedule._history[-1].work_entries] == [1.0, 2.0]
+    assert [goal.name for goal in schedule._goals["math"]] == ["proof"]
+
+
+@pytest.mark.parametrize("storage", schedule.STORAGE_MODES)
+def test_concurrent_writers(tmp_path, storage):
+    root_dir = str(tmp_path)
+    _new_schedule(root_dir, storage)
+    version = _version(root_dir)
+    n_processes, n_saves = 4, 10
+
+    code = f"""import sys; sys.path.insert(0, {WORKSCHEDULE_DIR!r})
+import schedule
+for _ in range({n_saves}):
+    schedule.load({NAME!r}, {root_dir!r})
+    schedule.work("math", 1.0)
+    schedule.save({NAME!r}, {root_dir!r})"""
+    processes = [subprocess.Popen([sys.executable, "-c", code]) for _ in range(n_processes)]
+    assert [process.wait() for process in processes] == [0] * n_processes
+
+    assert _version(root_dir) == version + n_processes * n_saves
+    schedule.load(NAME, root_dir)
+    assert schedule._history[-1].get_hours("math") == n_processes * n_saves
+
+
+def test_missed_periods_are_started_once(tmp_path):
+    root_dir = str(tmp_path)
+    start = datetime.combine(helpers.now().date() - timedelta(days=3), time())
+    schedule._save(NAME, {"math": 1.0}, {"math": 0.0}, {"math": goals.GoalList()}, timer.Timer(),
+                   [history.Period(int(start.timestamp()))], [], {"period_days": 1}, root_dir=root_dir)
+
+    schedule.load(NAME, root_dir)  # starts the 3 missed periods
+    _save_in_other_process(root_dir, "schedule.work('math', 1.0)")  # loaded after same boundaries
+    schedule.work("math", 2.0)
+    schedule.save(NAME, root_dir)  # reloads schedule and applies operations again
+
+    schedule.load(NAME, root_dir)
+    starts = [history.period_start(schedule._history, idx) for idx in range(len(schedule._history))]
+    assert len(starts) == 4
+    assert starts == sorted(set(starts))
+    assert schedule._history[-1].get_hours("math") == 3.0
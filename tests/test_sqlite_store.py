@@ -0,0 +1,41 @@
+"""Conversion of schedules to and from sqlite, see `sqlite_store`."""
+import goals
+import history
+import schedule
+import timer
+
+NAME = "converted"
+
+
+def _closed_hours(periods) -> list:
+    return [(period.to_work, period.remaining) for period in list(periods)[:-1]]
+
+
+def test_closed_periods_survive_round_trip(tmp_path):
+    root_dir = str(tmp_path)
+    schedule._save(NAME, {"math": 4.0}, {"math": 0.0}, {"Period": goals.GoalList(), "math": goals.GoalList()},
+                   timer.Timer(), [history.Period()], [], root_dir=root_dir)
+    schedule.load(NAME, root_dir)
+    schedule.work("math", 1.0)
+    schedule.reset(["math"])
+    schedule.reset()
+    expected = _closed_hours(schedule._history)
+    assert expected == [({"math": 4.0}, {"math": 3.0}), ({"math": 4.0}, {"math": 0.0})]
+
+    schedule.set_storage("sqlite")
+    schedule.save(NAME, root_dir)
+    schedule.load(NAME, root_dir)
+    assert schedule._storage == "sqlite"
+    assert _closed_hours(schedule._history) == expected
+
+    schedule.reset(["math"])  # closes a period stored in database
+    schedule.save(NAME, root_dir)
+    schedule.load(NAME, root_dir)
+    expected.append(({"math": 4.0}, {"math": 4.0}))
+    assert _closed_hours(schedule._history) == expected
+
+    schedule.set_storage("pickle")
+    schedule.save(NAME, root_dir)
+    schedule.load(NAME, root_dir)
+    assert schedule._storage == "pickle"
+    assert _closed_hours(schedule._history) == expected
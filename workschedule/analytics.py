@@ -0,0 +1,242 @@
+"""Statistics over all periods of a schedule, computed with numpy.
+
+History is converted into flat columns with one element per entry:
+period index, topic id, kind (WORK, DONE or FAILED), value (hours of
+work entries, number of goals of goal entries) and timestamp. Periods
+replaced by summaries contribute one entry per topic and kind, holding
+the totals of the summary.
+
+Per-topic/per-period matrices are computed from the columns with
+`np.bincount`, rolling averages from cumulative sums. Closed periods are
+converted only once, the current period again whenever an entry was
+added to it, and computed matrices are cached until then, see
+`Analytics.columns`.
+"""
+import numpy as np
+
+import history
+
+WORK, DONE, FAILED = 0, 1, 2
+KINDS = {"hours": WORK, "done": DONE, "failed": FAILED}
+SPARKS = "▁▂▃▄▅▆▇█"
+_FIELDS = ["period", "topic", "kind", "value", "time"]
+_DTYPES = [np.int32, np.int32, np.int8, np.float64, np.int64]
+
+
+def _n_entries(period) -> int:
+    """Returns number of entries of period, which changes whenever an entry is added."""
+    if hasattr(period, "work_times"):
+        return len(period.work_times) + len(period.goal_entries)
+    return len(getattr(period, "new_entries", ()))
+
+
+def _concatenate(blocks: list) -> dict:
+    return {field: np.concatenate([block[field] for block in blocks]) if len(blocks) > 0
+            else np.empty(0, dtype) for field, dtype in zip(_FIELDS, _DTYPES)}
+
+
+class Analytics:
+    """Columns of all entries of history_ and statistics computed from them."""
+
+    def __init__(self, history_):
+        self.history = history_
+        self.topics = []  # topic name of each topic id
+        self._topic_ids = {}
+        self._closed = []  # columns of each closed period
+        self._closed_columns = None  # concatenated columns of closed periods
+        self._columns = None
+        self._key = None  # number of periods and entries of current period when columns were computed
+        self._results = {}  # computed matrices, cleared when columns change
+
+    def _topic_id(self, topic: str) -> int:
+        if topic not in self._topic_ids:
+            self._topic_ids[topic] = len(self.topics)
+            self.topics.append(topic)
+        return self._topic_ids[topic]
+
+    def _convert(self, idx: int) -> dict:
+        """Returns columns of entries of period at idx."""
+        period = self.history[idx]
+        topics, kinds, values, times = [], [], [], []
+        if hasattr(period, "work_times"):
+            topic_map = np.array([self._topic_id(topic) for topic in period.topics] or [0], dtype=np.int32)
+            work = {"topic": topic_map[np.array(period.work_topics, dtype=np.int64)],
+                    "value": np.array(period.work_hours, dtype=np.float64),
+                    "time": np.array(period.work_times, dtype=np.int64)}
+        else:
+            if isinstance(period, history.PeriodSummary):
+                entries = [(topic, hours, period.start) for topic, hours in period.hours.items()]
+            else:
+                entries = [(entry.topic, entry.hours, entry.timestamp) for entry in period.work_entries]
+            work = {"topic": np.array([self._topic_id(topic) for topic, _, _ in entries], dtype=np.int32),
+                    "value": np.array([hours for _, hours, _ in entries], dtype=np.float64),
+                    "time": np.array([timestamp for _, _, timestamp in entries], dtype=np.int64)}
+
+        if isinstance(period, history.PeriodSummary):
+            for kind, counts in [(DONE, period.goals_done), (FAILED, period.goals_failed)]:
+                for topic, count in counts.items():
+                    topics.append(self._topic_id(topic))
+                    kinds.append(kind)
+                    values.append(count)
+                    times.append(period.start)
+        else:
+            for entry in period.goal_entries:
+                topics.append(self._topic_id(entry.topic))
+                kinds.append(DONE if isinstance(entry, history.GoalDoneEntry) else FAILED)
+                values.append(1)
+                times.append(entry.timestamp)
+
+        n_work = len(work["value"])
+        return {"period": np.full(n_work + len(values), idx, dtype=np.int32),
+                "topic": np.concatenate([work["topic"], np.array(topics, dtype=np.int32)]),
+                "kind": np.concatenate([np.zeros(n_work, dtype=np.int8), np.array(kinds, dtype=np.int8)]),
+                "value": np.concatenate([work["value"], np.array(values, dtype=np.float64)]),
+                "time": np.concatenate([work["time"], np.array(times, dtype=np.int64)])}
+
+    def columns(self) -> dict:
+        """Returns columns of all entries, as dict of field name to array.
+
+        Only periods closed since last call and the current period are
+        converted.
+        """
+        n_periods = len(self.history)
+        if len(self._closed) > n_periods - 1:  # history was replaced
+            self.__init__(self.history)
+        if len(self._closed) < n_periods - 1:
+            while len(self._closed) < n_periods - 1:
+                self._closed.append(self._convert(len(self._closed)))
+            self._closed_columns = None
+        if self._closed_columns is None:
+            self._closed_columns = _concatenate(self._closed)
+            self._columns = None
+
+        key = (n_periods, _n_entries(self.history[-1]))
+        if self._columns is None or key != self._key:
+            self._columns = _concatenate([self._closed_columns, self._convert(n_periods - 1)])
+            self._key = key
+            self._results.clear()
+        return self._columns
+
+    def matrix(self, kind: int) -> np.ndarray:
+        """Returns sum of values of entries of kind, as matrix of shape (periods, topics)."""
+        columns = self.columns()
+        if kind not in self._results:
+            n_periods, n_topics = len(self.history), len(self.topics)
+            mask = columns["kind"] == kind
+            cells = columns["period"][mask].astype(np.int64) * n_topics + columns["topic"][mask]
+            self._results[kind] = np.bincount(cells, weights=columns["value"][mask],
+                                              minlength=n_periods * n_topics).reshape(n_periods, n_topics)
+        return self._results[kind]
+
+    def to_work(self, current: dict = None) -> np.ndarray:
+        """Returns hours to work per period and topic, NaN where unknown.
+
+        Hours of closed periods are known if they were recorded when period
+        was closed, current gives hours of current period.
+        """
+        self.columns()
+        if "to_work" not in self._results:
+            hours = np.full((len(self.history), len(self.topics)), np.nan)
+            for idx in range(len(self.history) - 1):
+                period_to_work = getattr(self.history[idx], "to_work", None) or {}
+                for topic, topic_hours in period_to_work.items():
+                    if topic in self._topic_ids:
+                        hours[idx, self._topic_ids[topic]] = topic_hours
+            self._results["to_work"] = hours
+        hours = self._results["to_work"].copy()
+        for topic, topic_hours in (current or {}).items():
+            if topic in self._topic_ids:
+                hours[-1, self._topic_ids[topic]] = topic_hours
+        return hours
+
+    def deficit(self, current: dict = None) -> np.ndarray:
+        """Returns hours to work minus hours worked per period and topic, NaN where unknown."""
+        return self.to_work(current) - self.matrix(WORK)
+
+
+def rolling_mean(matrix: np.ndarray, window: int) -> np.ndarray:
+    """Returns mean of each column over the last window rows, first rows average fewer rows.
+
+    NaN values are ignored.
+    """
+    valid = ~np.isnan(matrix)
+    zeros = np.zeros((1,) + matrix.shape[1:])
+    sums = np.concatenate([zeros, np.cumsum(np.where(valid, matrix, 0), axis=0)])
+    counts = np.concatenate([zeros, np.cumsum(valid, axis=0)])
+    lower = np.maximum(np.arange(1, len(matrix) + 1) - window, 0)
+    window_counts = counts[1:] - counts[lower]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (sums[1:] - sums[lower]) / window_counts
+
+
+def sparkline(values: np.ndarray) -> str:
+    """Returns values as a line of block characters, NaN as spaces."""
+    valid = ~np.isnan(values)
+    if not valid.any():
+        return " " * len(values)
+    low, high = np.nanmin(values), np.nanmax(values)
+    scaled = np.zeros(len(values), dtype=np.int64)
+    if high > low:
+        scaled[valid] = np.round((values[valid] - low) / (high - low) * (len(SPARKS) - 1))
+    return "".join(SPARKS[level] if is_valid else " " for level, is_valid in zip(scaled, valid))
+
+
+_cached: Analytics = None
+
+
+def analytics(history_) -> Analytics:
+    """Returns Analytics of history_, which is kept while the same history is passed."""
+    global _cached
+    if _cached is None or _cached.history is not history_:
+        _cached = Analytics(history_)
+    return _cached
+
+
+def series(history_, stat: str, window: int = 1, current_to_work: dict = None) -> tuple:
+    """Returns topics and matrix of stat per period and topic.
+
+    Parameters
+    ----------
+    stat
+        One of KINDS or "deficit".
+    window
+        Number of periods values are averaged over.
+    """
+    analytics_ = analytics(history_)
+    if stat == "deficit":
+        matrix = analytics_.deficit(current_to_work)
+    else:
+        matrix = analytics_.matrix(KINDS[stat])
+    if window > 1:
+        matrix = rolling_mean(matrix, window)
+    return list(analytics_.topics), matrix
+
+
+def text_report(topics: list, matrix: np.ndarray) -> str:
+    """Returns one line per topic with sparkline, mean and last value of its column."""
+    width = max([len("total")] + [len(topic) for topic in topics])
+    # total is unknown in periods where values of all topics are unknown
+    total = np.where(np.isnan(matrix).all(axis=1), np.nan, np.nansum(matrix, axis=1)) if len(topics) > 0 \
+        else np.zeros(len(matrix))
+    lines = []
+    for name, column in [("total", total)] + list(zip(topics, matrix.T)):
+        with np.errstate(invalid="ignore"):
+            mean = np.nanmean(column) if (~np.isnan(column)).any() else np.nan
+        lines.append(f"{name:<{width}} {sparkline(column)} mean {mean:.2f} last {column[-1]:.2f}")
+    return "\n".join(lines)
+
+
+def plot(topics: list, matrix: np.ndarray, stat: str, path: str) -> None:
+    """Saves a line plot with one line per topic to path, needs matplotlib."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    figure, axes = plt.subplots()
+    for topic, column in zip(topics, matrix.T):
+        axes.plot(np.arange(len(column)), column, label=topic)
+    axes.set_xlabel("period")
+    axes.set_ylabel(stat)
+    axes.legend()
+    figure.savefig(path)
+    plt.close(figure)
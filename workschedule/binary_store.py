@@ -0,0 +1,415 @@
+"""Binary file format of schedules.
+
+A file starts with MAGIC and a format version, followed by sections. Each
+section is a one byte tag and the length of its payload:
+
+    MAGIC  version:H  (tag:B  length:I  payload)*
+
+All strings (topic and goal names, descriptions, days) are stored once in
+the STRINGS section and referenced by their index. Integers and floats are
+little-endian. Work entries of a period are stored as three fixed-width
+columns (timestamp:q, topic id:I, hours:d), which are decoded with a single
+`array.frombytes` each. Only plain values are stored, so reading a file
+never executes code and does not depend on module names, unlike pickle.
+
+Closed periods are stored in a separate archive file, see
+`history.LazyHistory`. It is only appended to and contains the records of
+all archived periods followed by an index and a trailer:
+
+    (length:I  period)*  n:I  offsets:q*n  starts:q*n  index offset:q  garbage:q  INDEX_MAGIC
+
+The schedule file stores the length of the valid part of archive file, so
+bytes appended by a save which did not complete are ignored.
+"""
+import json
+import struct
+import sys
+from array import array
+from datetime import datetime
+
+import goals
+import history
+import timer
+
+MAGIC = b"WSCHED\x00"
+VERSION = 2  # version 1 stored offsets of archived periods in schedule file
+INDEX_MAGIC = b"WSINDEX\x00"
+
+STRINGS, TOPICS, GOALS, TODO, TIMER, SETTINGS, DEADLINES, PERIODS, HISTORY = range(9)
+PERIOD, SUMMARY = range(2)
+
+_SECTION = struct.Struct("<BI")
+_U32 = struct.Struct("<I")
+_TOPIC = struct.Struct("<Idd")
+_GOAL = struct.Struct("<IIBq")  # name, description, periodic, deadline (-1 for none)
+_PAIR = struct.Struct("<II")
+_DEADLINE = struct.Struct("<qII")
+_GOAL_ENTRY = struct.Struct("<BqIIIB")  # done, timestamp, topic, goal name, description, periodic
+_PERIOD_HEAD = struct.Struct("<BqBdI")  # kind, start, closed, total hours, number of topics
+_NO_DEADLINE = -1
+_NO_START = -1  # start of periods archived before starts were stored
+_TRAILER = struct.Struct("<qq8s")
+
+
+class FormatException(Exception): pass
+
+
+def _column(typecode: str, values) -> bytes:
+    column = array(typecode, values)
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column.tobytes()
+
+
+def _read_column(typecode: str, data, offset: int, count: int) -> tuple:
+    """Returns array of count values at offset and offset after it."""
+    column = array(typecode)
+    end = offset + count * column.itemsize
+    column.frombytes(data[offset:end])
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column, end
+
+
+class _Writer:
+
+    def __init__(self):
+        self.string_ids = {}  # id of each string, in order of ids
+
+    def string(self, text: str) -> int:
+        """Returns id of text in string table."""
+        return self.string_ids.setdefault(text, len(self.string_ids))
+
+    def string_table(self) -> bytes:
+        # strings are separated by NUL, so they are split by a single call when reading
+        joined = "\0".join(self.string_ids)
+        if joined.count("\0") != max(len(self.string_ids) - 1, 0):
+            raise FormatException("strings must not contain NUL characters")
+        encoded = joined.encode()
+        return _U32.pack(len(self.string_ids)) + encoded
+
+    def hours(self, hours: dict, typecode: str = "d") -> bytes:
+        """Encodes dict of string to value as column of string ids and column of values."""
+        ids = self.string_ids
+        return _U32.pack(len(hours)) + _column("I", [ids.setdefault(topic, len(ids)) for topic in hours]) \
+            + _column(typecode, hours.values())
+
+    def pairs(self, pairs: list) -> bytes:
+        return _U32.pack(len(pairs)) + b"".join(
+            _PAIR.pack(self.string(first), self.string(second)) for first, second in pairs)
+
+    def period(self, period) -> bytes:
+        closed = period.to_work is not None
+        is_summary = isinstance(period, history.PeriodSummary)
+        topics = period.hours if is_summary else period.topics
+        parts = [_PERIOD_HEAD.pack(SUMMARY if is_summary else PERIOD, period.start, closed,
+                                   period.total_hours, len(topics))]
+        parts.append(_column("I", [self.string(topic) for topic in topics]))
+        parts.append(_column("d", [period.hours.get(topic, 0.0) for topic in topics]))
+        if closed:
+            parts.append(self.hours(period.to_work))
+            parts.append(self.hours(period.remaining))
+        if not is_summary:
+            parts.append(_U32.pack(len(period.work_times)))
+            for column in [period.work_times, period.work_topics, period.work_hours]:
+                if sys.byteorder == "big":
+                    column = array(column.typecode, column)
+                    column.byteswap()
+                parts.append(column.tobytes())
+            parts.append(_U32.pack(len(period.goal_entries)))
+            ids = self.string_ids
+            for entry in period.goal_entries:
+                parts.append(_GOAL_ENTRY.pack(
+                    isinstance(entry, history.GoalDoneEntry), entry.timestamp, ids.setdefault(entry.topic, len(ids)),
+                    ids.setdefault(entry.goal_name, len(ids)), ids.setdefault(entry.description, len(ids)),
+                    entry.periodic))
+        parts.append(_U32.pack(len(period.days)))
+        for day, day_hours in period.days.items():
+            parts.append(_U32.pack(self.string(day)))
+            parts.append(self.hours(day_hours))
+        parts.append(self.hours(period.goals_done, "I"))
+        parts.append(self.hours(period.goals_failed, "I"))
+        if is_summary:
+            parts.append(self.pairs(period.done_goals))
+            parts.append(self.pairs(period.failed_goals))
+        return b"".join(parts)
+
+
+def _section(tag: int, payload: bytes) -> bytes:
+    return _SECTION.pack(tag, len(payload)) + payload
+
+
+def encode(to_work: dict, remaining: dict, goals_: dict, work_timer: timer.Timer,
+           history_: history.LazyHistory, todo: list, settings: dict, deadlines: list) -> bytes:
+    """Returns schedule encoded in binary format.
+
+    Only periods which are not archived are encoded, together with the
+    positions of archived periods in archive file of history_.
+    """
+    writer = _Writer()
+    sections = []
+
+    sections.append(_section(TOPICS, _U32.pack(len(to_work)) + b"".join(
+        _TOPIC.pack(writer.string(topic), hours, remaining[topic]) for topic, hours in to_work.items())))
+
+    parts = [_U32.pack(len(goals_))]
+    for topic, goal_list in goals_.items():
+        parts.append(_PAIR.pack(writer.string(topic), len(goal_list)))
+        for goal in goal_list:
+            parts.append(_GOAL.pack(writer.string(goal.name), writer.string(goal.description), goal.periodic,
+                                    _NO_DEADLINE if goal.deadline is None else goal.deadline))
+    sections.append(_section(GOALS, b"".join(parts)))
+
+    sections.append(_section(TODO, writer.pairs(todo)))
+
+    if work_timer.topic is None:
+        sections.append(_section(TIMER, b""))
+    else:
+        sections.append(_section(TIMER, struct.pack("<Id", writer.string(work_timer.topic),
+                                                    work_timer.tic.timestamp())))
+
+    sections.append(_section(SETTINGS, json.dumps(settings).encode()))
+    sections.append(_section(DEADLINES, _U32.pack(len(deadlines)) + b"".join(
+        _DEADLINE.pack(deadline, writer.string(topic), writer.string(name)) for deadline, topic, name in deadlines)))
+
+    sections.append(_section(HISTORY, struct.pack("<Iq", history_.generation, history_.end)))
+
+    parts = [_U32.pack(len(history_.periods))]
+    for period in history_.periods:
+        record = writer.period(period)
+        parts.append(_U32.pack(len(record)))
+        parts.append(record)
+    sections.append(_section(PERIODS, b"".join(parts)))
+
+    # string table is written first, so strings are known when other sections are read
+    return MAGIC + struct.pack("<H", VERSION) + _section(STRINGS, writer.string_table()) + b"".join(sections)
+
+
+class _Reader:
+
+    def __init__(self, data, strings: list = None):
+        self.data = data
+        self.strings = strings
+
+    def string_table(self, offset: int, length: int) -> None:
+        count, = _U32.unpack_from(self.data, offset)
+        self.strings = str(self.data[offset + 4:offset + length], "utf-8").split("\0") if count > 0 else []
+
+    def hours(self, offset: int, typecode: str = "d") -> tuple:
+        """Returns dict of string to value at offset and offset after it."""
+        count, = _U32.unpack_from(self.data, offset)
+        string_ids, offset = _read_column("I", self.data, offset + 4, count)
+        values, offset = _read_column(typecode, self.data, offset, count)
+        return dict(zip(map(self.strings.__getitem__, string_ids), values)), offset
+
+    def pairs(self, offset: int) -> tuple:
+        count, = _U32.unpack_from(self.data, offset)
+        offset += 4
+        strings = self.strings
+        pairs = [(strings[first], strings[second]) for first, second in _PAIR.iter_unpack(
+            self.data[offset:offset + count * _PAIR.size])]
+        return pairs, offset + count * _PAIR.size
+
+    def period(self, offset: int):
+        """Decodes period record at offset."""
+        strings = self.strings
+        kind, start, closed, total_hours, n_topics = _PERIOD_HEAD.unpack_from(self.data, offset)
+        offset += _PERIOD_HEAD.size
+        topic_ids, offset = _read_column("I", self.data, offset, n_topics)
+        topics = [strings[topic_id] for topic_id in topic_ids]
+        hours, offset = _read_column("d", self.data, offset, n_topics)
+
+        period_cls = history.PeriodSummary if kind == SUMMARY else history.Period
+        period = period_cls.__new__(period_cls)
+        period.start = start
+        period.hours = dict(zip(topics, hours))
+        period.total_hours = total_hours
+        period.to_work = period.remaining = None
+        if closed:
+            period.to_work, offset = self.hours(offset)
+            period.remaining, offset = self.hours(offset)
+
+        if kind == PERIOD:
+            period.topics = topics
+            period._topic_ids = {topic: topic_id for topic_id, topic in enumerate(topics)}
+            n_work, = _U32.unpack_from(self.data, offset)
+            offset += 4
+            period.work_times, offset = _read_column("q", self.data, offset, n_work)
+            period.work_topics, offset = _read_column("I", self.data, offset, n_work)
+            period.work_hours, offset = _read_column("d", self.data, offset, n_work)
+            n_goals, = _U32.unpack_from(self.data, offset)
+            offset += 4
+            goal_entries = []
+            for done, timestamp, topic, goal_name, description, periodic in _GOAL_ENTRY.iter_unpack(
+                    self.data[offset:offset + n_goals * _GOAL_ENTRY.size]):
+                entry_cls = history.GoalDoneEntry if done else history.GoalFailEntry
+                goal_entries.append(entry_cls(strings[topic], strings[goal_name], strings[description],
+                                              bool(periodic), timestamp))
+            offset += n_goals * _GOAL_ENTRY.size
+            period.goal_entries = goal_entries
+
+        n_days, = _U32.unpack_from(self.data, offset)
+        offset += 4
+        days = {}
+        for _ in range(n_days):
+            day, = _U32.unpack_from(self.data, offset)
+            days[strings[day]], offset = self.hours(offset + 4)
+        period.days = days
+        period.goals_done, offset = self.hours(offset, "I")
+        period.goals_failed, offset = self.hours(offset, "I")
+        if kind == SUMMARY:
+            period.done_goals, offset = self.pairs(offset)
+            period.failed_goals, offset = self.pairs(offset)
+        return period
+
+
+def _sections(data) -> tuple:
+    """Returns format version and (offset, length) of payload of each section."""
+    if data[:len(MAGIC)] != MAGIC:
+        raise FormatException("not a schedule in binary format")
+    offset = len(MAGIC)
+    version, = struct.unpack_from("<H", data, offset)
+    if version > VERSION:
+        raise FormatException(f"schedule was written by a newer version (format {version})")
+    offset += 2
+    sections = {}
+    while offset < len(data):
+        tag, length = _SECTION.unpack_from(data, offset)
+        offset += _SECTION.size
+        sections[tag] = (offset, length)
+        offset += length
+    return version, sections
+
+
+def decode(data: bytes) -> list:
+    """Decodes schedule in binary format.
+
+    Returns [to_work, remaining, goals, work_timer, history, todo, settings, deadlines]
+    like an unpickled schedule, history is a history.LazyHistory whose archive
+    file is in binary format.
+    """
+    view = memoryview(data)
+    version, sections = _sections(view)
+    reader = _Reader(view)
+    reader.string_table(*sections[STRINGS])
+    strings = reader.strings
+
+    offset, length = sections[TOPICS]
+    count, = _U32.unpack_from(view, offset)
+    to_work = {}
+    remaining = {}
+    for topic, to_work_, remaining_ in _TOPIC.iter_unpack(view[offset + 4:offset + length]):
+        to_work[strings[topic]] = to_work_
+        remaining[strings[topic]] = remaining_
+
+    offset, _ = sections[GOALS]
+    n_topics, = _U32.unpack_from(view, offset)
+    offset += 4
+    goals_ = {}
+    for _ in range(n_topics):
+        topic, n_goals = _PAIR.unpack_from(view, offset)
+        offset += _PAIR.size
+        goal_list = goals_[strings[topic]] = goals.GoalList.__new__(goals.GoalList)
+        goal_list.__setstate__([  # goals were written in order of their names
+            goals.Goal(strings[name], strings[description], bool(periodic),
+                       None if deadline == _NO_DEADLINE else deadline)
+            for name, description, periodic, deadline in _GOAL.iter_unpack(view[offset:offset + n_goals * _GOAL.size])])
+        offset += n_goals * _GOAL.size
+
+    todo, _ = reader.pairs(sections[TODO][0])
+
+    work_timer = timer.Timer()
+    offset, length = sections[TIMER]
+    if length > 0:
+        topic, tic = struct.unpack_from("<Id", view, offset)
+        work_timer.topic = strings[topic]
+        work_timer.tic = datetime.fromtimestamp(tic)
+
+    offset, length = sections[SETTINGS]
+    settings = json.loads(bytes(view[offset:offset + length]))
+
+    offset, length = sections[DEADLINES]
+    deadlines = [(deadline, strings[topic], strings[name])
+                 for deadline, topic, name in _DEADLINE.iter_unpack(view[offset + 4:offset + length])]
+
+    offset, _ = sections[PERIODS]
+    n_periods, = _U32.unpack_from(view, offset)
+    offset += 4
+    periods = []
+    for _ in range(n_periods):
+        length, = _U32.unpack_from(view, offset)
+        periods.append(reader.period(offset + 4))
+        offset += 4 + length
+
+    history_ = history.LazyHistory(periods)
+    history_.binary = True
+    offset, _ = sections[HISTORY]
+    if version == 1:  # archive file has no index, it is rewritten on next save
+        history_.generation, n_archived = struct.unpack_from("<II", view, offset)
+        offsets, offset = _read_column("q", view, offset + 8, n_archived)
+        starts, offset = _read_column("q", view, offset, n_archived)
+        history_.offsets = offsets.tolist()
+        history_.starts = [None if start == _NO_START else start for start in starts]
+        history_.end = None
+        history_._convert_to = True
+    else:  # index is read from archive file when path of history is set
+        history_.generation, history_.end = struct.unpack_from("<Iq", view, offset)
+    return [to_work, remaining, goals_, work_timer, history_, todo, settings, deadlines]
+
+
+def encode_period(period) -> bytes:
+    """Returns a single period encoded together with its own string table."""
+    writer = _Writer()
+    record = writer.period(period)
+    strings = writer.string_table()
+    return _U32.pack(len(strings)) + strings + record
+
+
+def decode_period(data):
+    """Decodes a period encoded by `encode_period`, data can be any buffer."""
+    view = memoryview(data)
+    length, = _U32.unpack_from(view, 0)
+    reader = _Reader(view)
+    reader.string_table(4, length)
+    return reader.period(4 + length)
+
+
+def read_record(data, offset: int):
+    """Decodes period at offset of archive file, without copying data (e.g. a mmap)."""
+    length, = _U32.unpack_from(data, offset)
+    with memoryview(data) as view:
+        return decode_period(view[offset + 4:offset + 4 + length])
+
+
+def write_record(file, period) -> None:
+    record = encode_period(period)
+    file.write(_U32.pack(len(record)))
+    file.write(record)
+
+
+def write_index(file, offsets: list, starts: list, garbage: int) -> int:
+    """Writes index and trailer at current position of archive file, returns their size."""
+    index_offset = file.tell()
+    file.write(_U32.pack(len(offsets)))
+    file.write(_column("q", offsets))
+    file.write(_column("q", [_NO_START if start is None else start for start in starts]))
+    file.write(_TRAILER.pack(index_offset, garbage, INDEX_MAGIC))
+    return file.tell() - index_offset
+
+
+def read_index(data, end: int) -> tuple:
+    """Reads index of archive file whose valid part ends at end.
+
+    Returns
+    -------
+    offsets, starts, size of index and trailer, number of unused bytes in archive file
+    """
+    index_offset, garbage, magic = _TRAILER.unpack_from(data, end - _TRAILER.size)
+    if magic != INDEX_MAGIC:
+        raise FormatException("archive file has no valid index")
+    count, = _U32.unpack_from(data, index_offset)
+    with memoryview(data) as view:
+        offsets, offset = _read_column("q", view, index_offset + 4, count)
+        starts, _ = _read_column("q", view, offset, count)
+    return (offsets.tolist(), [None if start == _NO_START else start for start in starts],
+            end - index_offset, garbage)
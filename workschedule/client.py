@@ -0,0 +1,66 @@
+"""Thin command line client.
+
+Sends command line arguments to a running daemon (see `daemon.py`) and
+prints its output. When no daemon is running, the command is executed
+directly by terminal_interface. Imports are kept to a minimum, so
+starting the client is cheap.
+"""
+import profiling  # first, so the import phase of a profiled command includes all imports
+import json
+import os
+import socket
+import sys
+
+SOCKET_NAME = "workschedule.sock"
+
+
+def socket_path() -> str:
+    top_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(top_dir, SOCKET_NAME)
+
+
+def send(argv: list) -> str:
+    """Sends argv to daemon and returns its output.
+
+    Raises OSError if no daemon is running.
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        raise OSError("unix sockets are not supported")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path())
+        sock.sendall(json.dumps(argv).encode() + b"\n")
+        sock.shutdown(socket.SHUT_WR)
+        chunks = []
+        while chunk := sock.recv(65536):
+            chunks.append(chunk)
+    return b"".join(chunks).decode()
+
+
+def main() -> None:
+    argv = sys.argv[1:]
+    if argv[:2] == ["goal", "add"] and "-d" not in argv and "--description" not in argv:
+        # daemon can not read from our stdin
+        argv += ["--description", input("Enter description: ").rstrip()]
+    elif argv[:1] == ["batch"]:
+        # daemon can neither read our stdin nor resolve relative paths
+        if len(argv) == 1 or argv[1] == "-":
+            argv = ["batch", "--text", sys.stdin.read()]
+        else:
+            argv[1] = os.path.abspath(argv[1])
+    try:
+        if any(arg.startswith("--profile") for arg in argv) or os.environ.get(profiling.ENV_VAR) \
+                or os.environ.get(profiling.DUMP_ENV_VAR) or os.environ.get(profiling.MEMORY_ENV_VAR):
+            raise OSError("profiling is done without daemon")
+        if argv[:1] == ["watch"]:
+            raise OSError("dashboard reads schedule itself")
+        output = send(argv)
+    except OSError:
+        import terminal_interface
+        sys.argv[1:] = argv
+        terminal_interface.main()
+    else:
+        print(output, end="")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""Resident daemon keeping the active schedule in memory.
+
+Commands are received over a unix socket from `client.py`, executed by
+terminal_interface against the loaded schedule and their output is sent
+back. Changes are written to disk every `interval` seconds and on
+shutdown. If a command fails, the schedule is loaded again and the
+operations of earlier commands are performed again, so its partial
+changes are never saved.
+"""
+import contextlib
+import io
+import json
+import os
+import signal
+import socket
+import time
+import traceback
+
+import client
+import helpers
+import schedule
+import terminal_interface
+
+_name: str = None  # name of loaded schedule
+_dirty: bool = False  # loaded schedule has unsaved changes
+_running: bool = False
+
+
+def _load(name: str) -> None:
+    global _name, _dirty
+    schedule.load(name)
+    _name = name
+    _dirty = len(schedule._pending) > 0  # periods started or goals expired on load
+
+
+def flush() -> None:
+    """Saves loaded schedule if it has unsaved changes."""
+    global _dirty
+    if _dirty:
+        schedule.save(_name)
+        _dirty = False
+
+
+def _discard(pending: list) -> None:
+    """Loads schedule again and performs operations pending before a failed command again."""
+    schedule._pending[:] = pending
+    schedule._reapply(_name, os.path.join(helpers.get_top_directory(), "schedules"))
+
+
+def _run(argv: list) -> None:
+    """Runs command, discarding its changes if it fails."""
+    global _dirty
+    pending, storage = list(schedule._pending), schedule._storage
+    try:
+        terminal_interface.run(argv)
+    except Exception:
+        _discard(pending)
+        raise
+    if len(schedule._pending) > len(pending) or schedule._storage != storage:
+        _dirty = True
+
+
+def handle(argv: list) -> str:
+    """Executes a single command and returns everything it printed."""
+    global _dirty, _running
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+        try:
+            if len(argv) == 2 and argv[0] in ["set", "new"]:
+                flush()
+                if argv[0] == "new":
+                    schedule.new_schedule(argv[1])
+                terminal_interface.set_active(argv[1])
+                _load(argv[1])
+            elif argv[:1] == ["batch"]:
+                _run(argv)
+            elif argv[:1] == ["report"]:
+                flush()  # report reads schedules from disk
+                terminal_interface.run(argv)
+            elif argv[:2] == ["serve", "--stop"]:
+                _running = False
+                print("Stopped daemon.")
+            else:
+                n_pending = len(schedule._pending)
+                schedule.rollover()  # daemon may run across period boundaries and deadlines
+                schedule.expire_goals()
+                _dirty = _dirty or len(schedule._pending) > n_pending
+                _run(argv)
+        except SystemExit:  # raised by argparse on invalid arguments
+            pass
+        except Exception as err:
+            try:
+                terminal_interface.exeption_handler(err)
+            except Exception:
+                traceback.print_exc(file=output)
+    return output.getvalue()
+
+
+def _serve_connection(conn: socket.socket) -> None:
+    with conn:
+        data = b""
+        while chunk := conn.recv(65536):
+            data += chunk
+        conn.sendall(handle(json.loads(data)).encode())
+
+
+def serve(interval: float) -> None:
+    """Runs daemon until it is stopped.
+
+    Parameters
+    ----------
+    interval
+        Seconds between writes of the schedule to disk.
+    """
+    global _running
+    path = client.socket_path()
+    if os.path.exists(path):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            try:
+                probe.connect(path)
+            except OSError:  # left behind by a daemon which was killed
+                os.remove(path)
+            else:
+                print("There is already a daemon running!")
+                return
+
+    _load(schedule.get_active_schedule())
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.bind(path)
+        sock.listen()
+        sock.settimeout(interval)
+        _running = True
+        print(f"Serving '{_name}' on {path}.")
+        last_flush = time.monotonic()
+        try:
+            while _running:
+                try:
+                    conn, _ = sock.accept()
+                except socket.timeout:
+                    pass
+                else:
+                    conn.settimeout(None)
+                    _serve_connection(conn)
+                if time.monotonic() - last_flush >= interval:
+                    flush()
+                    last_flush = time.monotonic()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            flush()
+            os.remove(path)
@@ -0,0 +1,86 @@
+"""Streaming export of history as CSV or JSON Lines.
+
+Rows are produced by generators and written one at a time, filters are
+applied to whole periods first, so periods outside the requested date range
+are neither loaded nor walked.
+"""
+import csv
+import json
+from datetime import datetime
+
+import history
+
+FIELDS = ["period", "kind", "date", "topic", "hours", "goal", "description", "periodic"]
+
+
+def _periods(history_, since: int = None):
+    """Yields (index, period) of all periods ending after since."""
+    n_periods = len(history_)
+    for idx in range(n_periods):
+        if since is not None and idx + 1 < n_periods and history.period_start(history_, idx + 1) <= since:
+            continue  # period ended before since
+        yield idx, history_[idx]
+
+
+def _work_rows(idx: int, period, topic: str = None):
+    if topic is not None and topic not in period.hours:
+        return
+    if hasattr(period, "work_times"):  # read columns directly, without creating entries
+        entries = ((period.topics[topic_id], hours, timestamp) for timestamp, topic_id, hours
+                   in zip(period.work_times, period.work_topics, period.work_hours))
+    else:
+        entries = ((entry.topic, entry.hours, entry.timestamp) for entry in period.work_entries)
+    for topic_, hours, timestamp in entries:
+        if topic is None or topic_ == topic:
+            yield {"period": idx, "kind": "work", "date": timestamp, "topic": topic_, "hours": hours}
+
+
+def _goal_rows(idx: int, period, topic: str = None):
+    for entry in period.goal_entries:
+        if topic is None or entry.topic == topic:
+            kind = "done" if isinstance(entry, history.GoalDoneEntry) else "failed"
+            yield {"period": idx, "kind": kind, "date": entry.timestamp, "topic": entry.topic,
+                   "goal": entry.goal_name, "description": entry.description, "periodic": entry.periodic}
+
+
+def rows(history_, since: datetime = None, topic: str = None):
+    """Yields one dict per entry in history.
+
+    Parameters
+    ----------
+    history_
+        List of periods.
+    since
+        Only entries added at or after since are yielded.
+    topic
+        Only entries of topic are yielded.
+    """
+    since_ts = None if since is None else int(since.timestamp())
+    for idx, period in _periods(history_, since_ts):
+        for row in _work_rows(idx, period, topic):
+            if since_ts is None or row["date"] >= since_ts:
+                yield row
+        for row in _goal_rows(idx, period, topic):
+            if since_ts is None or row["date"] >= since_ts:
+                yield row
+
+
+def _formatted(rows_):
+    for row in rows_:
+        row["date"] = datetime.fromtimestamp(row["date"]).isoformat()
+        yield row
+
+
+def write_csv(rows_, file) -> None:
+    writer = csv.DictWriter(file, FIELDS)
+    writer.writeheader()
+    for row in _formatted(rows_):
+        writer.writerow(row)
+
+
+def write_jsonl(rows_, file) -> None:
+    for row in _formatted(rows_):
+        file.write(json.dumps(row) + "\n")
+
+
+WRITERS = {"csv": write_csv, "jsonl": write_jsonl}
@@ -1,16 +1,116 @@
-from dataclasses import dataclass, field
+import bisect
+import heapq
 
 
-
-@dataclass(order=True)
 class Goal:
-    """A goal can be a task or note."""
-    name: str = field(repr=True, compare=True)
-    description: str = field(repr=False, compare=False)
-    periodic: bool = field(repr=False, compare=False)
+    """A goal can be a task or note.
+
+    Goals are compared by name only. Not a dataclass, as importing
+    dataclasses slows down startup.
+    """
+
+    deadline = None  # seconds since epoch, goals pickled before deadlines were added have none
+
+    def __init__(self, name: str, description: str, periodic: bool, deadline: int = None):
+        self.name = name
+        self.description = description
+        self.periodic = periodic
+        if deadline is not None:
+            self.deadline = deadline
+
+    def __repr__(self) -> str:
+        return f"Goal(name={self.name!r})"
 
     def __str__(self) -> str:
         return self.name
 
     def __eq__(self, other) -> bool:
-        return self.name == other
\ No newline at end of file
+        return self.name == other
+
+    def __lt__(self, other) -> bool:
+        return self.name < other.name
+
+
+class GoalList:
+    """Goals of a single topic, iterated in alphabetical order.
+
+    Goals are looked up by name in a dict, a sorted list of names
+    is maintained with bisect for ordered iteration.
+    """
+
+    def __init__(self, goals: list = ()):
+        self._goals = {}
+        self._names = []
+        for goal in goals:
+            self.add(goal)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._goals
+
+    def __iter__(self):
+        for name in self._names:
+            yield self._goals[name]
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __getitem__(self, idx: int) -> Goal:
+        return self._goals[self._names[idx]]
+
+    def __repr__(self) -> str:
+        return f"GoalList({list(self)!r})"
+
+    def get(self, name: str) -> Goal:
+        return self._goals[name]
+
+    def add(self, goal: Goal) -> None:
+        """Adds a goal, replacing any goal with same name."""
+        if goal.name not in self._goals:
+            bisect.insort(self._names, goal.name)
+        self._goals[goal.name] = goal
+
+    def pop(self, name: str) -> Goal:
+        """Removes goal with name and returns it."""
+        goal = self._goals.pop(name)
+        del self._names[bisect.bisect_left(self._names, name)]
+        return goal
+
+    def remove(self, name: str) -> None:
+        self.pop(name)
+
+    def __getstate__(self) -> list:
+        return list(self)
+
+    def __setstate__(self, state: list) -> None:
+        self._goals = {goal.name: goal for goal in state}
+        self._names = [goal.name for goal in state]
+
+
+def deadline_heap(goals_: dict) -> list:
+    """Returns min-heap of (deadline, topic, name) of all goals with a deadline."""
+    heap = [(goal.deadline, topic, goal.name) for topic, goal_list in goals_.items()
+            for goal in goal_list if goal.deadline is not None]
+    heapq.heapify(heap)
+    return heap
+
+
+def push_deadline(heap: list, topic: str, goal: Goal) -> None:
+    heapq.heappush(heap, (goal.deadline, topic, goal.name))
+
+
+def pop_expired(heap: list, goals_: dict, now: int) -> list:
+    """Removes all goals whose deadline is before now from goals_.
+
+    Goals are not removed from heap when they are done or removed, such
+    entries are skipped here.
+
+    Returns
+    -------
+    List of (topic, goal) of expired goals, ordered by deadline.
+    """
+    expired = []
+    while len(heap) > 0 and heap[0][0] <= now:
+        deadline, topic, name = heapq.heappop(heap)
+        if topic in goals_ and name in goals_[topic] and goals_[topic].get(name).deadline == deadline:
+            expired.append((topic, goals_[topic].pop(name)))
+    return expired
@@ -1,36 +1,155 @@
-from pathlib import Path
+import functools
+import os
+from contextlib import contextmanager
+from datetime import datetime
 
+_frozen_time: datetime = None
 
-def get_top_directory() -> Path:
-    tmp_path = Path(__file__).absolute().parent.parent
-    if not (tmp_path / "workschedule/__init__.py").exists():
+
+def get_top_directory() -> str:
+    # os.path instead of pathlib, importing pathlib is slow
+    tmp_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if not os.path.exists(os.path.join(tmp_path, "workschedule", "__init__.py")):
         raise ValueError(f"coud not find top directory, found {tmp_path}")
     return tmp_path
 
 
+def now() -> datetime:
+    """Returns current time, or the frozen time inside `frozen_clock`."""
+    if _frozen_time is not None:
+        return _frozen_time
+    return datetime.now()
+
+
+@contextmanager
+def frozen_clock(time: datetime):
+    """All calls to `now` inside this context return time."""
+    global _frozen_time
+    prev_time = _frozen_time
+    _frozen_time = time
+    try:
+        yield
+    finally:
+        _frozen_time = prev_time
+
+
+def display_width(text: str) -> int:
+    """Returns number of terminal columns text occupies.
+
+    Ascii characters occupy one column, other characters as many as
+    wcwidth reports. Widths of non-ascii strings are memoised.
+    """
+    if text.isascii():
+        return len(text)
+    return _wide_width(text)
+
+
+@functools.lru_cache(maxsize=4096)
+def _wide_width(text: str) -> int:
+    from wcwidth import wcwidth
+    return sum(max(wcwidth(char), 0) for char in text)
+
+
+def _prefix_end(text: str, width: int, start: int = 0) -> int:
+    """Returns end of longest piece of text from start which is at most width columns
+    wide, the piece contains at least one character."""
+    if text.isascii():
+        return start + max(width, 1)
+    from wcwidth import wcwidth
+
+    used = 0
+    for idx in range(start, len(text)):
+        used += max(wcwidth(text[idx]), 0)
+        if used > width and idx > start:
+            return idx
+    return len(text)
+
+
+def _chunks(text: str, width: int) -> list:
+    """Cuts text into pieces of at most width columns."""
+    if text.isascii():
+        width = max(width, 1)
+        return [text[idx:idx + width] for idx in range(0, len(text), width)]
+    chunks = []
+    start = 0
+    while True:
+        end = _prefix_end(text, width, start)
+        chunks.append(text[start:end])
+        if end >= len(text):
+            return chunks
+        start = end
+
+
 def split_lines(text: str, line_length: int) -> str:
-    """Places newlines so that no words are cut."""
-    text = list(text)
-    split_idx = line_length
-    for idx, val in enumerate(text):
-        if val == " ":
-            split_idx = idx
-        if idx - 1 == line_length - 1:
-            if text[split_idx] == " ":
-                text[split_idx] = "\n"
-            else:
-                text = text[:split_idx] + ["\n"] \
-                       + text[split_idx:]
-    return "".join(text)
+    """Places newlines so that no line is wider than line_length columns.
+
+    Lines are broken at spaces, only words wider than line_length are cut.
+    Existing newlines are kept. Runs in linear time.
+    """
+    lines = []
+    for paragraph in text.split("\n"):
+        width_of = len if paragraph.isascii() else display_width
+        line = []
+        width = -1  # width of line plus the space before next word
+        for word in paragraph.split(" "):
+            word_width = width_of(word)
+            if line and width + 1 + word_width > line_length:
+                lines.append(" ".join(line))
+                line, width = [], -1
+            if word_width > line_length:
+                *pieces, word = _chunks(word, line_length)
+                lines.extend(pieces)
+                word_width = display_width(word)
+            line.append(word)
+            width += 1 + word_width
+        lines.append(" ".join(line))
+    return "\n".join(lines)
 
 
 def cutoff(text: str, line_length: int) -> str:
-    if len(text) <= line_length:
+    """Cuts text to at most line_length columns ending with "...", at a space if possible."""
+    if display_width(text) <= line_length:
         return text
 
-    cut_idx = line_length - 4
-    for idx, val in enumerate(text):
-        if val == " ":
-            cut_idx = idx
-        if idx == line_length - 3:
-            return text[:cut_idx] + "..."
+    head = text[:_prefix_end(text, line_length - 3)]
+    space_idx = head.rfind(" ")
+    if text[len(head):len(head) + 1] != " " and space_idx > 0:
+        head = head[:space_idx]
+    return head + "..."
+
+
+@contextmanager
+def locked(path: str, shared: bool = False):
+    """Holds an advisory lock on file at path while in context.
+
+    File is created if it does not exist and yielded opened for reading
+    and writing. On Windows locks are always exclusive.
+    """
+    file = os.fdopen(os.open(path, os.O_RDWR | os.O_CREAT), "r+b")
+    try:
+        if os.name == "nt":
+            import msvcrt
+            msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(file.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield file
+        finally:
+            if os.name == "nt":
+                file.seek(0)
+                msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+    finally:
+        file.close()
+
+
+def atomic_write(path: str, data: bytes) -> None:
+    """Replaces file at path with data, readers see either old or new file."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
@@ -1,46 +1,245 @@
-from dataclasses import dataclass, field
-from datetime import datetime
+import lzma
+import mmap
+import os
+import pickle
+import sys
+from array import array
+from collections.abc import Sequence
+from datetime import date, datetime, time, timedelta
+
+import helpers
+
+
+DATE_FORMAT = "%d/%m/%Y//%H/%M/%S"
+
+
+def to_timestamp(date: str) -> int:
+    """Converts a date formatted as DATE_FORMAT to seconds since epoch."""
+    return int(datetime.strptime(date, DATE_FORMAT).timestamp())
+
+
+def format_timestamp(timestamp: int) -> str:
+    """Formats seconds since epoch as DATE_FORMAT."""
+    return datetime.fromtimestamp(timestamp).strftime(DATE_FORMAT)
+
+
+def _now_timestamp() -> int:
+    return int(helpers.now().timestamp())
+
+
+def day_of(timestamp: int) -> str:
+    """Returns day of timestamp as YYYY-MM-DD in local time."""
+    return date.fromtimestamp(timestamp).isoformat()
+
+
+def day_bounds(day: str) -> tuple:
+    """Returns seconds since epoch of start of day and start of next day."""
+    start = datetime.combine(date.fromisoformat(day), time())
+    return int(start.timestamp()), int((start + timedelta(days=1)).timestamp())
+
+
+def period_boundaries(start: int, days: int, end: int) -> list:
+    """Returns seconds since epoch of all period boundaries between start and end.
+
+    Boundaries are at midnight, every days days after the day of start.
+    """
+    first_day = date.fromtimestamp(start)
+    n_boundaries = (date.fromtimestamp(end) - first_day).days // days
+    return [int(datetime.combine(first_day + timedelta(days=days * k), time()).timestamp())
+            for k in range(1, n_boundaries + 1)]
+
+
+def split_by_day(start: float, end: float) -> list:
+    """Splits time between start and end (seconds since epoch) at midnight.
+
+    Returns
+    -------
+    List of (timestamp, hours), one per day. timestamp is end, or the last
+    second of the day for all days except the last one.
+    """
+    end = max(start, end)
+    chunks = []
+    while True:
+        next_day = day_bounds(day_of(start))[1]
+        if end <= next_day:
+            chunks.append((int(end), (end - start) / 3600))
+            return chunks
+        chunks.append((next_day - 1, (next_day - start) / 3600))
+        start = next_day
+
+
+def _slots(cls: type) -> tuple:
+    """Returns names of all slots of cls, starting with base class."""
+    return tuple(slot for cls_ in reversed(cls.__mro__) for slot in getattr(cls_, "__slots__", ()))
 
 
-@dataclass
 class Entry:
-    topic: str
-    date: str = field(init=False)
+    """Base class of all entries.
+
+    Entries only store seconds since epoch, date is computed on access.
+    Entries pickled before timestamps were introduced are converted
+    in __setstate__.
+    """
+    __slots__ = ("topic", "timestamp")
+
+    def __init__(self, topic: str, timestamp: int = None):
+        self.topic = sys.intern(topic)
+        self.timestamp = _now_timestamp() if timestamp is None else timestamp
+
+    @property
+    def date(self) -> str:
+        return format_timestamp(self.timestamp)
+
+    def _fields(self) -> tuple:
+        return tuple(getattr(self, slot) for slot in _slots(type(self)))
+
+    def __getstate__(self) -> tuple:
+        return self._fields()
+
+    def __setstate__(self, state) -> None:
+        if isinstance(state, dict):  # dataclass pickled before slots were introduced
+            state = dict(state)
+            state["timestamp"] = to_timestamp(state.pop("date"))
+            for key, val in state.items():
+                setattr(self, key, val)
+            self.topic = sys.intern(self.topic)
+            return
+        for slot, val in zip(_slots(type(self)), state):
+            setattr(self, slot, val)
+
+    def __eq__(self, other) -> bool:
+        return type(self) is type(other) and self._fields() == other._fields()
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{slot}={getattr(self, slot)!r}" for slot in _slots(type(self)))
+        return f"{type(self).__name__}({fields})"
 
-    def __post_init__(self):
-        self.date = datetime.now().strftime("%d/%m/%Y//%H/%M/%S")
 
-@dataclass
 class WorkEntry(Entry):
-    hours: float
+    __slots__ = ("hours",)
+
+    def __init__(self, topic: str, hours: float, timestamp: int = None):
+        super().__init__(topic, timestamp)
+        self.hours = hours
+
 
-@dataclass
 class GoalEntry(Entry):
-    goal_name: str
-    description: str
-    periodic: bool
+    __slots__ = ("goal_name", "description", "periodic")
+
+    def __init__(self, topic: str, goal_name: str, description: str, periodic: bool,
+                 timestamp: int = None):
+        super().__init__(topic, timestamp)
+        self.goal_name = goal_name
+        self.description = description
+        self.periodic = periodic
+
 
-@dataclass
-class GoalDoneEntry(GoalEntry): pass
+class GoalDoneEntry(GoalEntry):
+    __slots__ = ()
 
-@dataclass
-class GoalFailEntry(GoalEntry): pass
 
+class GoalFailEntry(GoalEntry):
+    __slots__ = ()
 
 
 class Period:
+    """Entries added during one period.
 
-    def __init__(self):
-        self.start = datetime.now().strftime("%d/%m/%Y//%H/%M/%S")
-        self.work_entries = []
+    Work entries are stored as parallel arrays of timestamps, topic ids
+    and hours; topic names are stored once in topics. Hours are summed
+    per topic and per day and topic while entries are added.
+    """
+
+    def __init__(self, start: int = None):
+        self.start = _now_timestamp() if start is None else start
+        self.topics = []  # topic name of each topic id
+        self._topic_ids = {}
+        self.work_times = array("q")
+        self.work_topics = array("I")
+        self.work_hours = array("d")
         self.goal_entries = []
+        self.to_work = None  # to_work and remaining of schedule when period was closed
+        self.remaining = None
+        self._init_totals()
+
+    @property
+    def work_entries(self) -> list:
+        return [WorkEntry(self.topics[topic_id], hours, timestamp) for timestamp, topic_id, hours
+                in zip(self.work_times, self.work_topics, self.work_hours)]
+
+    def _topic_id(self, topic: str) -> int:
+        if topic not in self._topic_ids:
+            self._topic_ids[topic] = len(self.topics)
+            self.topics.append(sys.intern(topic))
+        return self._topic_ids[topic]
+
+    def _init_totals(self) -> None:
+        """Computes running totals from entries."""
+        self.hours = {}  # hours worked per topic
+        self.total_hours = 0
+        self.days = {}  # hours worked per topic on each day, by YYYY-MM-DD
+        self.goals_done = {}  # number of goals marked as done per topic
+        self.goals_failed = {}
+        for timestamp, topic_id, hours in zip(self.work_times, self.work_topics, self.work_hours):
+            self._count_hours(self.topics[topic_id], hours, timestamp)
+        for entry in self.goal_entries:
+            self._count(entry)
+
+    def _count_hours(self, topic: str, hours: float, timestamp: int) -> None:
+        self.hours[topic] = self.hours.get(topic, 0) + hours
+        self.total_hours += hours
+        day_hours = self.days.setdefault(day_of(timestamp), {})
+        day_hours[topic] = day_hours.get(topic, 0) + hours
+
+    def _count(self, entry: Entry) -> None:
+        if isinstance(entry, WorkEntry):
+            self._count_hours(entry.topic, entry.hours, entry.timestamp)
+        elif isinstance(entry, GoalDoneEntry):
+            self.goals_done[entry.topic] = self.goals_done.get(entry.topic, 0) + 1
+        elif isinstance(entry, GoalFailEntry):
+            self.goals_failed[entry.topic] = self.goals_failed.get(entry.topic, 0) + 1
+
+    def __getstate__(self) -> dict:
+        state = dict(self.__dict__)
+        del state["_topic_ids"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        if "work_entries" in state:  # pickled before entries were stored as arrays
+            state = dict(state)
+            work_entries = state.pop("work_entries")
+            if isinstance(state["start"], str):
+                state["start"] = to_timestamp(state["start"])
+            state.update(topics=[], work_times=array("q"), work_topics=array("I"), work_hours=array("d"))
+            self.__dict__.update(state)
+            self._topic_ids = {}
+            for entry in work_entries:
+                self._append_work(entry)
+        else:
+            self.__dict__.update(state)
+            self._topic_ids = {topic: topic_id for topic_id, topic in enumerate(self.topics)}
+        if "days" not in state:  # pickled before totals were added
+            self._init_totals()
+        self.__dict__.setdefault("to_work", None)
+        self.__dict__.setdefault("remaining", None)
+
+    def close(self, to_work: dict, remaining: dict) -> None:
+        """Records to_work and remaining hours of schedule at end of period."""
+        self.to_work = dict(to_work)
+        self.remaining = dict(remaining)
+
+    def _append_work(self, entry: WorkEntry) -> None:
+        self.work_times.append(entry.timestamp)
+        self.work_topics.append(self._topic_id(entry.topic))
+        self.work_hours.append(entry.hours)
 
     def add_entry(self, entry: Entry) -> None:
         """Adds an entry to period."""
         if isinstance(entry, WorkEntry):
-            self.work_entries.append(entry)
+            self._append_work(entry)
         elif isinstance(entry, GoalEntry):
             self.goal_entries.append(entry)
+        self._count(entry)
 
     def get_hours(self, topic: str = None) -> float:
         """Returns number of hours worked.
@@ -49,8 +248,327 @@ class Period:
         ----------
         topic
             Topic for which worked hours are returned. If None all hours worked are returned."""
-        hours = 0
-        for entry in self.work_entries:
-            if topic is None or entry.topic == topic:
-                hours += entry.hours
-        return hours
\ No newline at end of file
+        if topic is None:
+            return self.total_hours
+        return self.hours.get(topic, 0)
+
+    def get_day_hours(self, day: str, topic: str = None) -> float:
+        """Returns number of hours worked on day (YYYY-MM-DD), on topic or on all topics."""
+        day_hours = self.days.get(day, {})
+        if topic is None:
+            return sum(day_hours.values())
+        return day_hours.get(topic, 0)
+
+
+class PeriodSummary:
+    """Closed period whose entries were moved to the raw archive.
+
+    Keeps totals and names of done/failed goals, see `Period` for
+    the meaning of attributes.
+    """
+
+    def __init__(self, period: Period):
+        self.start = period.start
+        self.to_work = getattr(period, "to_work", None)
+        self.remaining = getattr(period, "remaining", None)
+        self.hours = dict(period.hours)
+        self.total_hours = period.get_hours()
+        self.days = {day: dict(day_hours) for day, day_hours in period.days.items()}
+        self.goals_done = dict(period.goals_done)
+        self.goals_failed = dict(period.goals_failed)
+        self.done_goals = [(entry.topic, entry.goal_name) for entry in period.goal_entries
+                           if isinstance(entry, GoalDoneEntry)]
+        self.failed_goals = [(entry.topic, entry.goal_name) for entry in period.goal_entries
+                             if isinstance(entry, GoalFailEntry)]
+
+    @property
+    def work_entries(self) -> list:
+        return []  # see read_raw_archive
+
+    @property
+    def goal_entries(self) -> list:
+        return []
+
+    def get_hours(self, topic: str = None) -> float:
+        if topic is None:
+            return self.total_hours
+        return self.hours.get(topic, 0)
+
+    get_day_hours = Period.get_day_hours
+
+
+def raw_archive_path(history_path: str) -> str:
+    """Returns path of raw archive belonging to archive file at history_path."""
+    return os.path.splitext(history_path)[0] + ".archive.xz"
+
+
+def read_raw_archive(path: str):
+    """Yields all periods moved to raw archive at path, oldest first."""
+    if not os.path.exists(path):
+        return
+    with lzma.open(path, "rb") as file:
+        while True:
+            try:
+                yield pickle.load(file)
+            except EOFError:
+                break
+
+
+def with_raw_periods(history_, raw_archive: str) -> list:
+    """Returns periods of history, where summaries are replaced by the
+    raw periods read from raw_archive.
+
+    Periods are compacted oldest first, so the n-th summary belongs to the
+    n-th period in raw archive.
+    """
+    raw_periods = read_raw_archive(raw_archive)
+    return [next(raw_periods, period) if isinstance(period, PeriodSummary) else period
+            for period in history_]
+
+
+class LazyHistory(Sequence):
+    """List of periods, where closed periods are stored in an archive file.
+
+    Archived periods are only unpickled when they are indexed. Periods which
+    are not archived yet (at least the current period) are pickled together
+    with the history itself.
+
+    If binary is set, archived periods are stored in the format of
+    `binary_store` instead of pickled. Such an archive file ends with an
+    index of all periods, is read through mmap and only new periods and the
+    index are appended to it. end is the length of its valid part.
+
+    When periods are compacted, archive file is rewritten to a new file whose
+    name contains an increased generation, so an archive file referenced by
+    the pickled history is never modified except by appending.
+    """
+
+    def __init__(self, periods: list = None):
+        self.path = None  # path to archive file of generation 0, set when schedule is loaded
+        self.generation = 0
+        self.offsets = []  # position of each archived period in archive file
+        self.starts = []  # start of each archived period
+        self.periods = [] if periods is None else list(periods)
+        self._cache = {}
+        self._summaries = {}  # archived periods which are replaced by a summary on next archive
+        self._raw = []  # periods which are moved to raw archive on next archive
+        self._stale_file = None
+        self.binary = False
+        self._convert_to = None  # format archive file is converted to on next archive
+        self.end = 0
+        self._index_size = 0
+        self._garbage = 0  # bytes of archive file used by indexes written before
+        self._map = None
+        self._file = None  # archive file opened for reading
+
+    def attach(self, path: str) -> None:
+        """Sets path of archive file of generation 0, opens archive file and reads its index if
+        it is binary.
+
+        Archive file stays open, so periods can still be read after another
+        process compacted the history and removed the file, see `remove_stale`.
+        """
+        self.path = path
+        if len(self.offsets) > 0 or self.end:  # end is None for archives written by format version 1
+            self._opened()
+        if self.binary and self.end:
+            import binary_store
+            self.offsets, self.starts, self._index_size, self._garbage = binary_store.read_index(
+                self._mapped(), self.end)
+
+    def _opened(self):
+        if self._file is None:
+            self._file = open(self.file_path, "rb")
+        return self._file
+
+    def _mapped(self) -> mmap.mmap:
+        if self._map is None:
+            self._map = mmap.mmap(self._opened().fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map
+
+    def close(self) -> None:
+        """Unmaps and closes archive file."""
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    @property
+    def file_path(self) -> str:
+        if self.generation == 0:
+            return self.path
+        return f"{self.path}.{self.generation}"
+
+    def __len__(self) -> int:
+        return len(self.offsets) + len(self.periods)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("period index out of range")
+
+        if idx >= len(self.offsets):
+            return self.periods[idx - len(self.offsets)]
+        if idx in self._summaries:
+            return self._summaries[idx]
+        if idx not in self._cache:
+            if self.binary:
+                import binary_store
+                self._cache[idx] = binary_store.read_record(self._mapped(), self.offsets[idx])
+            else:
+                file = self._opened()
+                file.seek(self.offsets[idx])
+                self._cache[idx] = pickle.load(file)
+        return self._cache[idx]
+
+    def _dump(self, period: Period, file) -> None:
+        if self.binary:
+            import binary_store
+            binary_store.write_record(file, period)
+        else:
+            pickle.dump(period, file)
+
+    def set_binary(self, binary: bool) -> None:
+        """Sets format of archive file, archived periods are converted on next archive."""
+        if len(self.offsets) == 0:
+            self.binary = binary
+        elif binary != self.binary:
+            self._convert_to = binary
+
+    def start(self, idx: int) -> int:
+        """Returns start of period at idx, without loading it from archive."""
+        if idx < 0:
+            idx += len(self)
+        if idx < len(self.starts) and self.starts[idx] is not None:
+            return self.starts[idx]
+        return self[idx].start
+
+    def append(self, period: Period) -> None:
+        self.periods.append(period)
+
+    def compact(self, keep: int) -> int:
+        """Replaces all periods except the last keep periods by summaries.
+
+        Raw periods are moved to raw archive on next `archive`. Current period
+        is never replaced. Returns number of replaced periods.
+        """
+        n_replaced = 0
+        for idx in range(len(self) - max(keep, 1)):
+            period = self[idx]
+            if not isinstance(period, Period):
+                continue
+            if idx < len(self.offsets):
+                self._summaries[idx] = PeriodSummary(period)
+            else:
+                self.periods[idx - len(self.offsets)] = PeriodSummary(period)
+            self._raw.append(period)
+            n_replaced += 1
+        return n_replaced
+
+    def _rewrite(self) -> None:
+        """Writes archived periods to archive file of next generation, replacing periods by
+        summaries and converting them to format set by `set_binary`."""
+        old_file = self.file_path
+        periods = [self[idx] for idx in range(len(self.offsets))]
+        if self._convert_to is not None:
+            self.binary = self._convert_to
+            self._convert_to = None
+        offsets = []
+        with open(f"{self.path}.{self.generation + 1}", "wb") as file:
+            for period in periods:
+                offsets.append(file.tell())
+                self._dump(period, file)
+            if self.binary:
+                import binary_store
+                self._index_size = binary_store.write_index(file, offsets, self.starts, 0)
+                self._garbage = 0
+                self.end = file.tell()
+        self.close()
+        self.generation += 1
+        self.offsets = offsets
+        self._cache = dict(self._summaries)
+        self._summaries = {}
+        self._stale_file = old_file
+
+    def archive(self, path: str) -> None:
+        """Moves all periods except the current one to archive file at path.
+
+        Compacted periods are moved to raw archive. Call `remove_stale`
+        once the history has been pickled.
+        """
+        self.path = path
+        self.write_raw(path)
+        if len(self._summaries) > 0 or self._convert_to is not None \
+                or (self.binary and self._garbage > self.end // 2):
+            self._rewrite()
+
+        if len(self.periods) <= 1:
+            return
+        if self.binary:
+            self._append_binary(self.periods[:-1])
+        else:
+            with open(self.file_path, "ab") as file:
+                for period in self.periods[:-1]:
+                    self.offsets.append(file.tell())
+                    self.starts.append(period.start)
+                    pickle.dump(period, file)
+        self.periods = self.periods[-1:]
+
+    def _append_binary(self, periods: list) -> None:
+        """Appends periods and a new index after the valid part of archive file.
+
+        The previous index is kept, so the file referenced by the saved
+        schedule stays valid until the schedule is saved.
+        """
+        import binary_store
+
+        self.close()
+        with open(self.file_path, "r+b" if self.end > 0 else "wb") as file:
+            file.seek(self.end)
+            for period in periods:
+                self.offsets.append(file.tell())
+                self.starts.append(period.start)
+                binary_store.write_record(file, period)
+            self._garbage += self._index_size
+            self._index_size = binary_store.write_index(file, self.offsets, self.starts, self._garbage)
+            self.end = file.tell()
+            file.truncate()
+
+    def write_raw(self, path: str) -> None:
+        """Appends compacted periods to raw archive belonging to archive file at path."""
+        if len(self._raw) > 0:
+            with lzma.open(raw_archive_path(path), "ab") as raw_file:
+                for period in self._raw:
+                    pickle.dump(period, raw_file)
+            self._raw = []
+
+    def remove_stale(self) -> None:
+        """Removes archive file of previous generation."""
+        self.close()
+        if self._stale_file is not None and os.path.exists(self._stale_file):
+            os.remove(self._stale_file)
+        self._stale_file = None
+
+    def __getstate__(self) -> dict:
+        return {"generation": self.generation, "offsets": self.offsets, "starts": self.starts,
+                "periods": self.periods, "binary": self.binary}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__()
+        self.generation = state.get("generation", 0)
+        self.offsets = state["offsets"]
+        self.starts = state.get("starts", [None] * len(self.offsets))
+        self.periods = state["periods"]
+        self.binary = state.get("binary", False)
+
+
+def period_start(history_: Sequence, idx: int) -> int:
+    """Returns start of period at idx, archived periods are not loaded."""
+    if isinstance(history_, LazyHistory):
+        return history_.start(idx)
+    return history_[idx].start
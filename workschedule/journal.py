@@ -0,0 +1,71 @@
+"""Journal file of operations performed since the last snapshot of a schedule.
+
+The file starts with MAGIC, followed by one record per operation. Each
+record is the pickled operation, preceded by its length and CRC-32, so a
+record which was only partially written (e.g. process was killed while
+appending) is detected without unpickling it.
+"""
+import pickle
+import struct
+import zlib
+
+SNAPSHOT_INTERVAL = 100  # number of journaled operations before a new snapshot is written
+MAGIC = b"WSJOURN1"
+_RECORD = struct.Struct("<II")  # length and CRC-32 of pickled record
+
+
+def append(path: str, records: list) -> None:
+    """Appends records to end of journal file."""
+    parts = []
+    for record in records:
+        data = pickle.dumps(record)
+        parts.append(_RECORD.pack(len(data), zlib.crc32(data)))
+        parts.append(data)
+    with open(path, "ab") as file:
+        if file.tell() == 0:
+            parts.insert(0, MAGIC)
+        file.write(b"".join(parts))
+
+
+def read(path: str) -> tuple:
+    """Returns all valid records stored in journal file and the end of the last one.
+
+    Reading stops at the first record which is incomplete or whose checksum
+    does not match. If end is less than the size of the file, records must
+    not be appended to it, it has to be cleared by writing a snapshot.
+    Journal files written before records were checksummed are read as
+    pickle stream, end is 0 for them.
+    """
+    with open(path, "rb") as file:
+        data = file.read()
+    if not data.startswith(MAGIC):
+        return _read_pickled(data), 0
+
+    records = []
+    offset = end = len(MAGIC)
+    while offset + _RECORD.size <= len(data):
+        length, checksum = _RECORD.unpack_from(data, offset)
+        record = data[offset + _RECORD.size:offset + _RECORD.size + length]
+        if len(record) < length or zlib.crc32(record) != checksum:
+            break
+        records.append(pickle.loads(record))
+        offset = end = offset + _RECORD.size + length
+    return records, end
+
+
+def _read_pickled(data: bytes) -> list:
+    import io
+
+    records = []
+    file = io.BytesIO(data)
+    while True:
+        try:
+            records.append(pickle.load(file))
+        except Exception:  # partially written record, any error can be raised by pickle
+            break
+    return records
+
+
+def clear(path: str) -> None:
+    """Removes all records from journal file."""
+    open(path, "wb").close()
@@ -0,0 +1,156 @@
+"""Profiling of a single command.
+
+Enabled by the global flag `--profile[=line|json]` or by setting
+WORKSCHEDULE_PROFILE to "line" or "json". Wall and cpu time of each phase
+of `terminal_interface.main`, size of the schedule files and number of
+loaded periods and entries are printed to stderr when the command
+finished. `--profile-memory` (or WORKSCHEDULE_PROFILE_MEMORY) additionally
+prints peak memory traced by tracemalloc, `--profile-dump FILE` (or
+WORKSCHEDULE_PROFILE_DUMP) writes cProfile stats to FILE, which can be
+inspected with pstats or snakeviz. Both slow down all phases after
+import, which is noted in the output.
+
+Phases are import (from import of this module, which is the first module
+imported by client and terminal_interface, until `configure` is called;
+startup of the interpreter is not included, see `python -X importtime`
+for it), parse, load, command and save. render (building the
+table of view) is part of command.
+"""
+import os
+import sys
+import time
+
+_started = (time.perf_counter(), time.process_time())  # when this module was imported
+
+ENV_VAR = "WORKSCHEDULE_PROFILE"
+DUMP_ENV_VAR = "WORKSCHEDULE_PROFILE_DUMP"
+MEMORY_ENV_VAR = "WORKSCHEDULE_PROFILE_MEMORY"
+FORMATS = ["line", "json"]
+
+_format: str = None  # None if profiling is disabled
+_dump_path: str = None
+_memory: bool = False  # trace memory with tracemalloc
+_profiler = None
+_phases: dict = {}  # [wall, cpu] seconds per phase, in order phases started
+_stats: dict = {}
+
+
+def configure(argv: list) -> list:
+    """Enables profiling if requested by argv or environment.
+
+    Returns argv without profiling flags.
+    """
+    global _format, _dump_path, _memory, _profiler
+    _format = os.environ.get(ENV_VAR) or None
+    _dump_path = os.environ.get(DUMP_ENV_VAR) or None
+    _memory = bool(os.environ.get(MEMORY_ENV_VAR))
+    remaining = []
+    args = iter(argv)
+    for arg in args:
+        if arg == "--profile":
+            _format = "line"
+        elif arg.startswith("--profile="):
+            _format = arg.split("=", 1)[1]
+        elif arg == "--profile-dump":
+            _dump_path = next(args, None)
+        elif arg == "--profile-memory":
+            _memory = True
+        else:
+            remaining.append(arg)
+    if _format is None and _dump_path is None and not _memory:
+        return remaining
+
+    if _format not in FORMATS:
+        _format = "line"
+    _add_phase("import", time.perf_counter() - _started[0], time.process_time() - _started[1])
+
+    if _memory:
+        import tracemalloc
+        tracemalloc.start()
+    if _dump_path is not None:
+        import cProfile
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+    return remaining
+
+
+def _add_phase(name: str, wall: float, cpu: float) -> None:
+    times = _phases.setdefault(name, [0.0, 0.0])
+    times[0] += wall
+    times[1] += cpu
+
+
+class phase:
+    """Adds wall and cpu time spent inside this context to phase name.
+
+    Not a contextlib.contextmanager, so importing this module imports
+    nothing which is not loaded at startup anyway.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self) -> None:
+        self.started = (time.perf_counter(), time.process_time())
+
+    def __exit__(self, *exc_info) -> None:
+        if _format is not None:
+            _add_phase(self.name, time.perf_counter() - self.started[0], time.process_time() - self.started[1])
+
+
+def record_schedule(name: str, root_dir: str, history_) -> None:
+    """Records size of files of schedule name and number of loaded periods and entries."""
+    if _format is None:
+        return
+    size = 0
+    for file_name in os.listdir(root_dir):
+        if file_name.split(".")[0] == name and not file_name.endswith(".lock"):
+            size += os.path.getsize(os.path.join(root_dir, file_name))
+    _stats["file_bytes"] = size
+    _stats["periods"] = len(history_)
+    _stats["entries"] = sum(_count_entries(period) for period in _loaded_periods(history_))
+
+
+def _loaded_periods(history_) -> list:
+    if hasattr(history_, "offsets"):  # LazyHistory, only count unpickled periods
+        return list(history_.periods) + list(history_._cache.values())
+    if hasattr(history_, "conn"):  # SqlHistory, entries stay in database
+        return list(history_.new_periods)
+    return list(history_)
+
+
+def _count_entries(period) -> int:
+    if hasattr(period, "work_times"):
+        return len(period.work_times) + len(period.goal_entries)
+    return 0
+
+
+def finish(file=None) -> None:
+    """Stops profiling and prints results."""
+    if _format is None:
+        return
+    if _profiler is not None:
+        _profiler.disable()
+        _profiler.dump_stats(_dump_path)
+    if _memory:
+        import tracemalloc
+        _stats["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    _stats["overhead"] = [name for name, enabled in [("tracemalloc", _memory), ("cProfile", _profiler)] if enabled]
+    _add_phase("total", time.perf_counter() - _started[0], time.process_time() - _started[1])
+
+    file = sys.stderr if file is None else file
+    if _format == "json":
+        import json
+        phases = {name: {"wall_ms": wall * 1000, "cpu_ms": cpu * 1000} for name, (wall, cpu) in _phases.items()}
+        print(json.dumps({"phases": phases, **_stats}), file=file)
+        return
+    parts = [f"{name} {wall * 1000:.1f}ms ({cpu * 1000:.1f}ms cpu)" for name, (wall, cpu) in _phases.items()]
+    if "file_bytes" in _stats:
+        parts.append(f"{_stats['file_bytes'] / 1024:.1f}kB on disk, "
+                     f"{_stats['periods']} periods, {_stats['entries']} entries loaded")
+    if _memory:
+        parts.append(f"peak {_stats['peak_memory_bytes'] / 1024:.1f}kB")
+    if _stats["overhead"]:
+        parts.append(f"times after import include overhead of {' and '.join(_stats['overhead'])}")
+    print("profile: " + " | ".join(parts), file=file)
@@ -0,0 +1,49 @@
+"""Rendered overviews stored in name.render next to the schedule.
+
+The file contains the version of the schedule the texts were rendered
+from, followed by (key, text) pairs. It is only used if the version
+matches the loaded schedule, see `schedule._rendered`. struct is the only
+import, so reading a cached overview is cheaper than rendering it.
+"""
+import struct
+
+import helpers
+
+MAGIC = b"WSRENDER"
+_HEADER = struct.Struct("<8sqI")  # magic, version of schedule, number of entries
+_U32 = struct.Struct("<I")
+
+
+def read(path: str, version: int) -> dict:
+    """Returns texts stored at path by key, empty if there are none for version of schedule."""
+    try:
+        with open(path, "rb") as file:
+            data = file.read()
+    except FileNotFoundError:
+        return {}
+    if len(data) < _HEADER.size:
+        return {}
+    magic, file_version, n_entries = _HEADER.unpack_from(data)
+    if (magic, file_version) != (MAGIC, version):
+        return {}
+    texts = {}
+    offset = _HEADER.size
+    for _ in range(n_entries):
+        strings = []
+        for _ in range(2):
+            length, = _U32.unpack_from(data, offset)
+            offset += _U32.size
+            strings.append(data[offset:offset + length].decode())
+            offset += length
+        texts[strings[0]] = strings[1]
+    return texts
+
+
+def write(path: str, texts: dict, version: int) -> None:
+    parts = [_HEADER.pack(MAGIC, version, len(texts))]
+    for key, text in texts.items():
+        for string in [key, text]:
+            data = string.encode()
+            parts.append(_U32.pack(len(data)))
+            parts.append(data)
+    helpers.atomic_write(path, b"".join(parts))
@@ -0,0 +1,111 @@
+"""Summary of all schedules in the schedules directory.
+
+Schedules are loaded and reduced to a summary in parallel by a process
+pool, the summaries are then merged into a single table or JSON.
+"""
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import helpers
+import history
+import schedule
+
+
+def find_schedules(root_dir: str) -> list:
+    """Returns names of all schedules in root_dir."""
+    names = set()
+    for suffix in [".schedule", ".db"]:
+        for path in glob.glob(os.path.join(glob.escape(root_dir), f"*{suffix}")):
+            names.add(os.path.basename(path)[:-len(suffix)])
+    return sorted(names)
+
+
+def summarize(name: str, root_dir: str) -> dict:
+    """Loads a schedule and reduces it to a summary.
+
+    Returns
+    -------
+    Dict containing hours worked per topic and number of done/failed goals
+    of each period, and open goals per topic.
+    """
+    schedule.load(name, root_dir)
+    periods = []
+    for period in schedule._history:
+        periods.append({
+            "start": history.format_timestamp(period.start),
+            "hours": dict(period.hours),
+            "done": sum(period.goals_done.values()),
+            "failed": sum(period.goals_failed.values()),
+        })
+    return {
+        "name": name,
+        "to_work": dict(schedule._to_work),
+        "periods": periods,
+        "open_goals": {topic: [goal.name for goal in goal_list] for topic, goal_list in schedule._goals.items()},
+    }
+
+
+def collect(names: list, root_dir: str, max_workers: int = None) -> list:
+    """Summarizes schedules in parallel, returns summaries in order of names."""
+    if len(names) <= 1:
+        return [summarize(name, root_dir) for name in names]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(summarize, names, [root_dir] * len(names)))
+
+
+def merge(summaries: list) -> dict:
+    """Merges summaries of multiple schedules.
+
+    Returns
+    -------
+    Dict with the summary of each schedule, total hours per topic over all
+    schedules and periods, and total number of open, done and failed goals.
+    """
+    total_hours = {}
+    totals = {"open_goals": 0, "done": 0, "failed": 0}
+    for summary in summaries:
+        for period in summary["periods"]:
+            for topic, hours in period["hours"].items():
+                total_hours[topic] = total_hours.get(topic, 0) + hours
+            totals["done"] += period["done"]
+            totals["failed"] += period["failed"]
+        totals["open_goals"] += sum(len(goal_names) for goal_names in summary["open_goals"].values())
+    return {"schedules": {summary["name"]: summary for summary in summaries},
+            "total_hours": total_hours, **totals}
+
+
+def as_table(merged: dict) -> str:
+    """Returns one row per schedule and topic, with hours of current period and of all periods."""
+    import prettytable
+
+    table = prettytable.PrettyTable()
+    table.field_names = ["Schedule", "Topic", "Worked", "Total", "Open", "Done", "Failed"]
+    for name, summary in merged["schedules"].items():
+        current = summary["periods"][-1]
+        total = {}
+        for period in summary["periods"]:
+            for topic, hours in period["hours"].items():
+                total[topic] = total.get(topic, 0) + hours
+        table.add_row([name, "Period", f"{sum(current['hours'].values()):.1f}", f"{sum(total.values()):.1f}",
+                       sum(len(goal_names) for goal_names in summary["open_goals"].values()),
+                       sum(period["done"] for period in summary["periods"]),
+                       sum(period["failed"] for period in summary["periods"])])
+        for topic in summary["to_work"]:
+            table.add_row(["", topic, f"{current['hours'].get(topic, 0):.1f}", f"{total.get(topic, 0):.1f}",
+                           len(summary["open_goals"].get(topic, [])), "", ""])
+    table.align = "r"
+    return table.get_string()
+
+
+def report(names: list = None, root_dir: str = None, as_json: bool = False) -> str:
+    """Returns report of schedules with names, by default of all schedules in root_dir."""
+    if root_dir is None:
+        root_dir = os.path.join(helpers.get_top_directory(), "schedules")
+    if names is None:
+        names = find_schedules(root_dir)
+    merged = merge(collect(names, root_dir))
+    if as_json:
+        import json
+        return json.dumps(merged, indent=2)
+    return as_table(merged)
@@ -1,11 +1,11 @@
+import functools
 import pickle
-import prettytable
-import textwrap
 import os
 
 import goals
 import helpers
 import history
+import journal
 import timer
 from history import GoalDoneEntry, GoalFailEntry, WorkEntry
 
@@ -24,6 +24,54 @@ _goals: dict
 _history: list[history.Period]
 _work_timer: timer.Timer
 _todo: list
+_settings: dict  # options of schedule, e.g. "keep_periods"
+_deadlines: list  # min-heap of (deadline, topic, goal name), see goals.deadline_heap
+_index = None  # search.SearchIndex of goals, read on first use, see _search_index
+_index_path: str = None
+_index_operations: list = []  # operations on search index not yet written to disk
+
+STORAGE_MODES = ["pickle", "binary", "journal", "sqlite"]
+_storage: str = "pickle"
+BINARY_MAGIC = b"WSCHED\x00"  # binary_store.MAGIC, binary_store is only imported to read such files
+_journal_len: int = 0  # number of records in journal file
+_pending: list = []  # journaled operations not yet written to disk
+_call_depth: int = 0
+_replaying: bool = False
+_version: int = 0  # version of schedule when it was loaded
+_render_cache: dict = None  # rendered overviews, cleared on every change, None until read, see _rendered
+_render_path: str = None
+
+
+def _journaled(func):
+    """Records calls to func, so they can be replayed from journal.
+
+    Only the outermost call is recorded, e.g. mark_done called by reset_todo
+    is not. All calls to `helpers.now` during func return the same time, which
+    is also stored in the record.
+
+    Every call clears cached overviews.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        global _call_depth, _render_cache
+        _render_cache = {}
+        if _call_depth > 0 or _replaying:
+            _call_depth += 1
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _call_depth -= 1
+
+        time = helpers.now()
+        _call_depth += 1
+        try:
+            with helpers.frozen_clock(time):
+                result = func(*args, **kwargs)
+        finally:
+            _call_depth -= 1
+        _pending.append((func.__name__, args, kwargs, time))
+        return result
+    return wrapper
 
 
 def _valid_topic_name(name: str) -> bool:
@@ -44,6 +92,7 @@ def _valid_schedule_name(name: str) -> bool:
     return True
 
 
+@_journaled
 def add_todo(topic:str, goal:str, pos:int=-1) -> None:
     """Adds a goal to todo-list.
     
@@ -67,6 +116,7 @@ def add_todo(topic:str, goal:str, pos:int=-1) -> None:
         _todo.append((topic, goal))
 
 
+@_journaled
 def remove_todo(pos:int) -> None:
     """Remove a goal form todo-list.
     
@@ -81,6 +131,7 @@ def remove_todo(pos:int) -> None:
     _todo.pop(pos)
 
 
+@_journaled
 def reset_todo(done:bool=False) -> None:
     """Clear todo-list.
     
@@ -95,6 +146,17 @@ def reset_todo(done:bool=False) -> None:
     _todo.clear()
 
 
+def hours_on(day: str, topic: str = None) -> float:
+    """Returns hours worked on day (YYYY-MM-DD), on topic or on all topics."""
+    day_start = history.day_bounds(day)[0]
+    hours = 0
+    for idx in range(len(_history) - 1, -1, -1):
+        if idx + 1 < len(_history) and history.period_start(_history, idx + 1) <= day_start:
+            break  # all earlier periods ended before day
+        hours += _history[idx].get_day_hours(day, topic)
+    return hours
+
+
 def todo_as_str() -> str:
     """Get current todo-list as printable string."""
     if len(_todo) == 0:
@@ -106,17 +168,19 @@ def todo_as_str() -> str:
     return todo_str
 
 
+@_journaled
 def add_topic(new_topic: str, hours: float) -> None:
     """Adds a new topic to current schedule"""
     if not _valid_topic_name(new_topic):
         raise InvalidNameException(f"'{new_topic}' is not a valid topic name!")
 
     if new_topic not in _to_work:
-        _goals[new_topic] = []
+        _goals[new_topic] = goals.GoalList()
     _to_work[new_topic] = hours
     _remaining[new_topic] = 0.0
 
 
+@_journaled
 def remove_topic(topic: str) -> None:
     """Remove a topic from current schedule."""
     if topic == "Period":
@@ -127,6 +191,7 @@ def remove_topic(topic: str) -> None:
     del _to_work[topic]
     del _remaining[topic]
     del _goals[topic]
+    _update_index("remove_topic", topic)
     for topic_, goal in _todo:
         if topic_ == topic:
             _todo.remove((topic_, goal))
@@ -138,13 +203,15 @@ def new_schedule(name: str) -> None:
     new_schedule_ = (
         {},  # to_work
         {},  # remaining
-        {"Period": []},  # goals
+        {"Period": goals.GoalList()},  # goals
         timer.Timer(),
-        [history.Period()]
+        [history.Period()],
+        []  # todo
     )
     _save(name, *new_schedule_)
 
 
+@_journaled
 def reset(carry_hours: list[str] = None) -> None:
     """Starts a new period.
 
@@ -153,42 +220,120 @@ def reset(carry_hours: list[str] = None) -> None:
     carry_hours
         List of topics for which unworked time is carried to new period.
     """
-    if carry_hours is None:
-        carry_hours = []
-
     try:
         stop_worktimer()
     except: pass
+    _start_periods([None], carry_hours)
 
-    for topic in _to_work:
-        if topic in carry_hours:
-            new_remaining = _to_work[topic] + _remaining[topic] - _history[-1].get_hours(topic)
-            _remaining[topic] = new_remaining
-        else:
-            _remaining[topic] = 0.0
-    _history.append(history.Period())
+
+def rollover() -> int:
+    """Starts all periods whose start passed since current period started.
+
+    Length of periods is set by setting "period_days", topics for which
+    unworked time is carried over by "carry_topics". Returns number of
+    started periods.
+    """
+    if not _settings.get("period_days"):
+        return 0
+    starts = history.period_boundaries(
+        history.period_start(_history, -1), _settings["period_days"], int(helpers.now().timestamp()))
+    if len(starts) > 0:
+        _rollover(starts)
+    return len(starts)
+
+
+@_journaled
+def _rollover(starts: list) -> None:
+    # starts which passed already are skipped, e.g. when replayed on a schedule
+    # saved by another process after the same rollover, see _reapply
+    current_start = history.period_start(_history, -1)
+    starts = [start for start in starts if start > current_start]
+    if len(starts) > 0:
+        _start_periods(starts, _settings.get("carry_topics"))
+
+
+def _start_periods(starts: list, carry_hours: list = None) -> None:
+    """Closes current period and appends one period per start in starts.
+
+    A start of None means now. Periodic goals done in current period are added again.
+    """
+    if carry_hours is None:
+        carry_hours = []
+    closed = _history[-1]
+    for idx, start in enumerate(starts):
+        for topic in _to_work:
+            if topic in carry_hours:
+                # only the first of the closed periods can contain work
+                hours = closed.get_hours(topic) if idx == 0 else 0
+                _remaining[topic] = _to_work[topic] + _remaining[topic] - hours
+            else:
+                _remaining[topic] = 0.0
+        _history[-1].close(_to_work, _remaining)
+        _history.append(history.Period(start))
+
+    for entry in closed.goal_entries:
+        if isinstance(entry, GoalDoneEntry) and entry.periodic and entry.topic in _goals \
+                and entry.goal_name not in _goals[entry.topic]:
+            _goals[entry.topic].add(goals.Goal(entry.goal_name, entry.description, True))
+            _update_index("add", entry.topic, entry.goal_name, entry.description, "open", None,
+                          int(helpers.now().timestamp()))
+
+    if "keep_periods" in _settings and _storage != "sqlite":
+        compact(_settings["keep_periods"])
+
+
+@_journaled
+def set_setting(key: str, value) -> None:
+    """Sets an option of schedule, value must be serializable as json."""
+    _settings[key] = value
+
+
+@_journaled
+def compact(keep: int) -> int:
+    """Replaces all periods except the last keep periods by summaries.
+
+    Entries of replaced periods are moved to compressed raw archive file
+    name.archive.xz on next save, see `history.read_raw_archive`. The
+    current period is always kept. Returns number of replaced periods.
+    """
+    global _history
+    if _storage == "sqlite":
+        raise InvalidNameException("Schedules stored in sqlite can not be compacted!")
+    if not isinstance(_history, history.LazyHistory):
+        _history = history.LazyHistory(_history)
+    return _history.compact(keep)
 
 
+@_journaled
 def work(topic: str, hours: float) -> None:
     if topic not in _to_work:
         raise InvalidNameException(f"Could not find topic '{topic}' in schedule!")
     _history[-1].add_entry(WorkEntry(topic, hours))
 
 
+@_journaled
 def start_worktimer(topic: str) -> None:
     if topic not in _to_work:
         raise InvalidNameException(f"Could not find topic '{topic}' in schedule!")
     _work_timer.start(topic)
 
 
+@_journaled
 def stop_worktimer() -> float:
-    """Stops working timer and adds worked hours."""
+    """Stops working timer and adds worked hours.
+
+    A session running past midnight is split into one work entry per day.
+    """
     topic, hours = _work_timer.stop()
-    work(topic, hours)
+    if topic not in _to_work:
+        raise InvalidNameException(f"Could not find topic '{topic}' in schedule!")
+    for timestamp, day_hours in history.split_by_day(_work_timer.tic.timestamp(), _work_timer.toc.timestamp()):
+        _history[-1].add_entry(WorkEntry(topic, day_hours, timestamp))
     return topic, hours
 
 
-def add_goal(topic: str, name: str, description: str, periodic: bool) -> None:
+@_journaled
+def add_goal(topic: str, name: str, description: str, periodic: bool, deadline: int = None) -> None:
     """Adds a goal to current period.
 
     Parameters
@@ -201,6 +346,8 @@ def add_goal(topic: str, name: str, description: str, periodic: bool) -> None:
         A description of the goal.
     periodic
         Goal is added after each reset.
+    deadline
+        Seconds since epoch, goal fails when it is not done until then.
     """
     if not _valid_goal_name(name):
         raise InvalidNameException(f"'{name}' is not a valid goal name!")
@@ -209,23 +356,46 @@ def add_goal(topic: str, name: str, description: str, periodic: bool) -> None:
     if name in _goals[topic]:
         raise DuplicateNameException(f"Goal names must be unique!")
 
-    new_goal = goals.Goal(name, description, periodic)
-    _goals[topic].append(new_goal)
-    _goals[topic] = sorted(_goals[topic])  # sort goals alphabetically
+    new_goal = goals.Goal(name, description, periodic, deadline)
+    _goals[topic].add(new_goal)
+    if deadline is not None:
+        goals.push_deadline(_deadlines, topic, new_goal)
+    _update_index("add", topic, name, description, "open", None, int(helpers.now().timestamp()))
+
+
+def expire_goals() -> int:
+    """Fails all goals whose deadline passed. Returns number of failed goals."""
+    now = int(helpers.now().timestamp())
+    if len(_deadlines) == 0 or _deadlines[0][0] > now:
+        return 0
+    return _expire_goals(now)
+
 
+@_journaled
+def _expire_goals(now: int) -> int:
+    expired = goals.pop_expired(_deadlines, _goals, now)
+    for topic, goal in expired:
+        _history[-1].add_entry(GoalFailEntry(topic, goal.name, goal.description, goal.periodic, goal.deadline))
+        _update_index("close", topic, goal.name, "failed", len(_history) - 1, goal.deadline)
+        _todo[:] = [entry for entry in _todo if entry != (topic, goal.name)]
+    return len(expired)
 
+
+@_journaled
 def remove_goal(topic: str, name: str) -> None:
     if topic not in _goals:
         raise InvalidNameException(f"Could not find topic '{topic}' in schedule!")
     if name not in _goals[topic]:
         raise InvalidNameException(f"Could not find goal '{name}'!")
     _goals[topic].remove(name)
+    _update_index("remove", topic, name)
     
     for entry in _todo:
         if (topic, name) == entry:
             _todo.remove(entry)
 
 
+@_journaled
 def mark_done(topic: str, name: str) -> None:
     """Mark a goal as done.
     
@@ -237,17 +407,81 @@ def mark_done(topic: str, name: str) -> None:
     if name not in _goals[topic]:
         raise InvalidNameException(f"Could not find goal '{name}' in topic '{topic}'!")
 
-    goal = _goals[topic].pop(_goals[topic].index(name))
-    _history[-1].add_entry(GoalDoneEntry(topic, name, goal.description, goal.periodic))
+    goal = _goals[topic].pop(name)
+    entry = GoalDoneEntry(topic, name, goal.description, goal.periodic)
+    _history[-1].add_entry(entry)
+    _update_index("close", topic, name, "done", len(_history) - 1, entry.timestamp)
 
     for idx, entry in enumerate(_todo):
         if (topic, goal.name) == entry:
             del _todo[idx]
 
 
+def _search_index():
+    """Returns search index of loaded schedule.
+
+    Index is read from name.index and operations since load are applied to
+    it. If there is no index for the loaded version, it is built from goals
+    and history.
+    """
+    global _index
+    if _index is None:
+        import search
+        _index = search.read(_index_path, _version)
+        if _index is None:
+            _index = search.build(_goals, _history)
+        else:
+            for method, *args in _index_operations:
+                getattr(_index, method)(*args)
+    return _index
+
+
+def _update_index(method: str, *args) -> None:
+    """Records a call of method of search index, which is applied when index is used.
+
+    Operations replayed from journal are already contained in a stored
+    index, otherwise the index is rebuilt anyway.
+    """
+    if _replaying:
+        return
+    _index_operations.append([method, *args])
+    if _index is not None:
+        getattr(_index, method)(*args)
+
+
+def search(terms: str, topic: str = None, since: int = None) -> list:
+    """Searches names and descriptions of open, done and failed goals.
+
+    Parameters
+    ----------
+    terms
+        Words which all have to occur in name or description of goal.
+    topic
+        Only search goals of topic.
+    since
+        Seconds since epoch, only return goals added, done or failed since then.
+
+    Returns
+    -------
+    List of [topic, name, status, period, timestamp], see `search.SearchIndex`.
+    """
+    if topic is not None and topic not in _goals:
+        raise InvalidNameException(f"Could not find topic '{topic}' in schedule!")
+    return _search_index().search(terms, topic, since)
+
+
 def load(name:str, root_dir:str = None) -> None:
     """Load a schedule.
-    
+
+    If a name.db database exists, schedule is read from it. Otherwise
+    name.schedule is unpickled, and if a journal file exists next to it,
+    all operations recorded in it are replayed on top of the loaded snapshot.
+
+    Schedule is read while holding a shared lock on name.lock, which also
+    stores the version of the schedule. Periods which should have started
+    since the schedule was saved are started, see `rollover`, and goals
+    whose deadline passed are failed, see `expire_goals`.
+
     Parameters
     ----------
     name
@@ -256,27 +490,250 @@ def load(name:str, root_dir:str = None) -> None:
         Directory containing name.schedule file."""
     if root_dir is None:
         root_dir = os.path.join(helpers.get_top_directory(), "schedules")
-
-    try:
-        with open(os.path.join(root_dir, f"{name}.schedule"), "rb") as file:
-            loaded = pickle.load(file)
-    except FileNotFoundError:
+    if not os.path.exists(os.path.join(root_dir, f"{name}.db")) \
+            and not os.path.exists(os.path.join(root_dir, f"{name}.schedule")):
         raise InvalidNameException(f"There is no schedule named '{name}'!")
 
-    global _to_work, _history, _remaining, _goals, _work_timer, _todo
-    _to_work, _remaining, _goals, _work_timer, _history, _todo = loaded
+    global _version
+    with helpers.locked(os.path.join(root_dir, f"{name}.lock"), shared=True) as lock_file:
+        _load(name, root_dir)
+        _version = _read_version(lock_file)
+    rollover()
+    expire_goals()
+
+
+def _read_version(lock_file) -> int:
+    lock_file.seek(0)
+    data = lock_file.read()
+    return int(data) if data else 0
+
+
+def _write_version(lock_file, version: int) -> None:
+    lock_file.seek(0)
+    lock_file.truncate()
+    lock_file.write(str(version).encode())
+    lock_file.flush()
+
+
+def _replay(records: list) -> None:
+    """Performs journaled operations again, at the time they were recorded."""
+    global _replaying
+    _replaying = True
+    try:
+        for func_name, args, kwargs, time in records:
+            with helpers.frozen_clock(time):
+                globals()[func_name](*args, **kwargs)
+    finally:
+        _replaying = False
+
+
+def _load(name: str, root_dir: str) -> None:
+    global _storage, _journal_len, _render_cache, _render_path
+    db_path = os.path.join(root_dir, f"{name}.db")
+    if os.path.exists(db_path):
+        import sqlite_store
+        loaded = sqlite_store.read(db_path)
+        _storage = "sqlite"
+    else:
+        try:
+            with open(os.path.join(root_dir, f"{name}.schedule"), "rb") as file:
+                data = file.read()
+        except FileNotFoundError:
+            raise InvalidNameException(f"There is no schedule named '{name}'!")
+        if data.startswith(BINARY_MAGIC):
+            import binary_store
+            loaded = binary_store.decode(data)
+            _storage = "binary"
+        else:  # schedules saved before binary format was added are pickled
+            loaded = pickle.loads(data)
+            _storage = "pickle"
+
+    global _to_work, _history, _remaining, _goals, _work_timer, _todo, _settings, _deadlines, _index, _index_path
+    _to_work, _remaining, _goals, _work_timer, _history, _todo = loaded[:6]
+    _settings = loaded[6] if len(loaded) > 6 else {}  # older schedules have no settings
+    for topic, goal_list in _goals.items():
+        if isinstance(goal_list, list):  # saved before goals were stored as GoalList
+            _goals[topic] = goals.GoalList(goal_list)
+    _deadlines = loaded[7] if len(loaded) > 7 else goals.deadline_heap(_goals)
+    if isinstance(_history, history.LazyHistory):
+        _history.attach(os.path.join(root_dir, f"{name}.history"))
+    _index = None
+    _index_path = os.path.join(root_dir, f"{name}.index")
+    _index_operations.clear()
+
+    _pending.clear()
+    _journal_len = 0
+    journal_path = os.path.join(root_dir, f"{name}.journal")
+    if _storage in ["pickle", "binary"] and os.path.exists(journal_path):
+        _storage = "journal"
+        records, end = journal.read(journal_path)
+        _replay(records)
+        _journal_len = len(records)
+        if end < os.path.getsize(journal_path):  # torn or old journal, write snapshot on next save
+            _journal_len = journal.SNAPSHOT_INTERVAL
+
+    _render_cache = None  # replayed operations are part of saved schedule
+    _render_path = os.path.join(root_dir, f"{name}.render")
+
+
+def _reapply(name: str, root_dir: str) -> None:
+    """Reloads a schedule which was saved by another process since it was loaded,
+    and performs all operations done since then again."""
+    pending = list(_pending)
+    storage = _storage
+    if _storage == "sqlite" and hasattr(_history, "conn"):
+        _history.conn.close()
+    elif isinstance(_history, history.LazyHistory):
+        _history.close()
+    _load(name, root_dir)
+    _replay(pending)
+    _pending.extend(pending)
+    if storage != _storage:
+        set_storage(storage)
 
 
 def save(name:str, root_dir:str=None) -> None:
-    _save(name, _to_work, _remaining, _goals, _work_timer, _history, _todo, root_dir=root_dir)
+    """Save currently loaded schedule.
+
+    An exclusive lock on name.lock is held while saving. If another process
+    saved the schedule since it was loaded, the schedule is reloaded and all
+    operations performed since loading are applied again before saving, so
+    no changes are lost.
+
+    In journal mode only operations since last load are appended to journal
+    file. Every `journal.SNAPSHOT_INTERVAL` operations the full schedule
+    is written and journal file is cleared.
 
+    Closed periods are moved to name.history archive file, so only the
+    current period is pickled with the schedule. Entries of compacted
+    periods are moved to name.archive.xz.
 
-def _save(name:str, schedule_:dict, remaining:dict, goals_:dict, work_timer:timer.Timer, history_:list, _todo:list, root_dir:str=None) -> None:
+    In sqlite mode only new periods and entries are inserted, together with
+    topics, goals, timer and todo-list.
+
+    In binary mode schedule and archive file are written in the format of
+    `binary_store`, which does not use pickle.
+    """
+    global _version
     if root_dir is None:
         root_dir = os.path.join(helpers.get_top_directory(), "schedules")
 
-    with open(os.path.join(root_dir, f"{name}.schedule"), "w+b") as file:
-        pickle.dump([schedule_, remaining, goals_, work_timer, history_, _todo], file)
+    with helpers.locked(os.path.join(root_dir, f"{name}.lock")) as lock_file:
+        version = _read_version(lock_file)
+        reloaded = version != _version
+        if reloaded:
+            _reapply(name, root_dir)
+        _write(name, root_dir)
+        _version = version + 1
+        _write_version(lock_file, _version)
+        if not reloaded:  # replayed operations are missing in index, it is rebuilt on next use
+            _write_index(version, _version)
+        if _render_cache:
+            import render_cache
+            render_cache.write(_render_path, _render_cache, _version)
+
+
+def _write_index(old_version: int, version: int) -> None:
+    """Appends operations on search index to name.index, or rewrites it if index was rebuilt."""
+    if _index is not None and _index.rewrite:
+        import search
+        search.write(_index_path, _index, version)
+        _index.rewrite = False
+    elif os.path.exists(_index_path):
+        import search
+        n_logged = search.append(_index_path, _index_operations, old_version, version)
+        if _index is not None and n_logged > search.LOG_LIMIT:
+            _index.rewrite = True
+    _index_operations.clear()
+
+
+def _write(name: str, root_dir: str) -> None:
+    global _journal_len, _history
+    schedule_path = os.path.join(root_dir, f"{name}.schedule")
+    journal_path = os.path.join(root_dir, f"{name}.journal")
+    history_path = os.path.join(root_dir, f"{name}.history")
+    db_path = os.path.join(root_dir, f"{name}.db")
+
+    if _storage == "sqlite":
+        import sqlite_store
+        if isinstance(_history, sqlite_store.SqlHistory):
+            sqlite_store.write_state(_history, _to_work, _remaining, _goals, _work_timer, _todo, _settings)
+        else:  # import schedule into new database, including entries of compacted periods
+            raw_path = history.raw_archive_path(history_path)
+            sqlite_store.write(db_path, _to_work, _remaining, _goals, _work_timer,
+                               history.with_raw_periods(_history, raw_path), _todo, _settings)
+            if isinstance(_history, history.LazyHistory) and _history.generation > 0:
+                history_path = _history.file_path
+            for path in [schedule_path, journal_path, history_path, raw_path]:
+                if os.path.exists(path):
+                    os.remove(path)
+        _pending.clear()
+        return
+
+    if not isinstance(_history, (list, history.LazyHistory)):  # export schedule from database
+        history_ = _history.to_list()
+        _history.conn.close()
+        os.remove(db_path)
+        _history = history_
+
+    if not isinstance(_history, history.LazyHistory):
+        _history = history.LazyHistory(_history)
+    _history.set_binary(_storage == "binary")
+
+    if _storage == "journal" and os.path.exists(journal_path) \
+            and _journal_len + len(_pending) < journal.SNAPSHOT_INTERVAL:
+        journal.append(journal_path, _pending)
+        _journal_len += len(_pending)
+    else:
+        _history.archive(history_path)
+        if _storage == "binary":
+            import binary_store
+            helpers.atomic_write(schedule_path, binary_store.encode(
+                _to_work, _remaining, _goals, _work_timer, _history, _todo, _settings, _deadlines))
+        else:
+            _save(name, _to_work, _remaining, _goals, _work_timer, _history, _todo, _settings, _deadlines,
+                  root_dir=root_dir)
+        _history.remove_stale()
+        if _storage == "journal":
+            journal.clear(journal_path)
+        elif os.path.exists(journal_path):
+            os.remove(journal_path)
+        _journal_len = 0
+    _pending.clear()
+
+
+def set_storage(mode: str) -> None:
+    """Change storage mode of currently loaded schedule, takes effect on next save.
+
+    Parameters
+    ----------
+    mode
+        One of STORAGE_MODES. 'pickle' rewrites whole schedule on each save,
+        'binary' does the same in the format of `binary_store`, 'journal'
+        appends performed operations to a journal file and 'sqlite' stores
+        schedule in a sqlite database.
+    """
+    if mode not in STORAGE_MODES:
+        raise InvalidNameException(f"'{mode}' is not a valid storage mode!")
+    global _storage, _journal_len
+    _storage = mode
+    _journal_len = journal.SNAPSHOT_INTERVAL  # force a full snapshot on next save
+
+
+def _save(name:str, schedule_:dict, remaining:dict, goals_:dict, work_timer:timer.Timer, history_:list, _todo:list, settings:dict=None, deadlines:list=None, root_dir:str=None) -> None:
+    if root_dir is None:
+        root_dir = os.path.join(helpers.get_top_directory(), "schedules")
+
+    helpers.atomic_write(os.path.join(root_dir, f"{name}.schedule"),
+                         pickle.dumps([schedule_, remaining, goals_, work_timer, history_, _todo, settings or {},
+                                       deadlines or []]))
+
+
+def raw_archive_path(name: str, root_dir: str = None) -> str:
+    """Returns path of raw archive containing entries of compacted periods of schedule name."""
+    if root_dir is None:
+        root_dir = os.path.join(helpers.get_top_directory(), "schedules")
+    return history.raw_archive_path(os.path.join(root_dir, f"{name}.history"))
 
 
 def get_active_schedule(path: str = None) -> str:
@@ -295,36 +752,51 @@ def set_as_active(name: str, path: str = None) -> None:
     if path is None:
         path = os.path.join(helpers.get_top_directory(), "curr_schedule")
 
-    with open(path, "wt") as file:
-        file.write(name)
+    helpers.atomic_write(path, name.encode())
+
+
+def _rendered(key: str, render) -> str:
+    """Returns render(), cached by key until schedule is changed.
+
+    Cached texts are stored in name.render when schedule is saved, so
+    they are reused by the next process loading the same version.
+    """
+    global _render_cache
+    if _render_cache is None:
+        import render_cache
+        _render_cache = render_cache.read(_render_path, _version)
+    if key not in _render_cache:
+        _render_cache[key] = render()
+    return _render_cache[key]
+
+
+def overview(cell_length: int = None) -> str:
+    """Get a table of hours and goals of all topics.
+
+    Goal names wider than cell_length columns are cut off. Table is
+    cached, see `_rendered`.
+    """
+    today = history.day_of(helpers.now().timestamp())
+    return _rendered(f"overview {cell_length} {today}", lambda: _overview(cell_length, today))
+
 
+def _overview(cell_length: int, today: str) -> str:
+    import prettytable
 
-def overview() -> str:
-    rows = [["Topic"], ["Worked"], ["toWork"], ["Goals"]]
+    rows = [["Topic"], ["Worked"], ["Today"], ["toWork"], ["Goals"]]
 
     rows[0].append("Period")
     rows[1].append(f"{_history[-1].get_hours():.2g}")
-    rows[2].append(f"{sum(_to_work.values()):.2g}({sum(_remaining.values()):+.2g})")
-    goal_cell_text = ""
-    for goal_ in _goals["Period"]:
-        if goal_.periodic:
-            goal_cell_text += f"{YELLOW}{goal_}{ENDC}\n"
-        else:
-            goal_cell_text += f"{goal_}\n"
-    rows[3].append(goal_cell_text.rstrip("\n"))
+    rows[2].append(f"{hours_on(today):.2g}")
+    rows[3].append(f"{sum(_to_work.values()):.2g}({sum(_remaining.values()):+.2g})")
+    rows[4].append(_goal_cell(_goals["Period"], cell_length))
 
     for topic in _to_work:
         rows[0].append(topic)
         rows[1].append(f"{_history[-1].get_hours(topic):.2g}")
-        rows[2].append(f"{_to_work[topic]:.2g}({_remaining[topic]:+.2g})")
-
-        goal_cell_text = ""
-        for goal_ in _goals[topic]:
-            if goal_.periodic:
-                goal_cell_text += f"{YELLOW}{goal_}{ENDC}\n"
-            else:
-                goal_cell_text += f"{goal_}\n"
-        rows[3].append(goal_cell_text.rstrip("\n"))
+        rows[2].append(f"{hours_on(today, topic):.2g}")
+        rows[3].append(f"{_to_work[topic]:.2g}({_remaining[topic]:+.2g})")
+        rows[4].append(_goal_cell(_goals[topic], cell_length))
 
     table = prettytable.PrettyTable()
     table.align = "c"
@@ -334,6 +806,17 @@ def overview() -> str:
     return table.get_string()
 
 
+def _goal_cell(goals_: goals.GoalList, cell_length: int = None) -> str:
+    goal_cell_text = ""
+    for goal_ in goals_:
+        name = goal_.name if cell_length is None else helpers.cutoff(goal_.name, cell_length)
+        if goal_.periodic:
+            goal_cell_text += f"{YELLOW}{name}{ENDC}\n"
+        else:
+            goal_cell_text += f"{name}\n"
+    return goal_cell_text.rstrip("\n")
+
+
 def topic_overview(topic: str, line_length: int) -> str:
     """Get an overview of one topic.
 
@@ -342,7 +825,7 @@ def topic_overview(topic: str, line_length: int) -> str:
     topic
         Name of topic.
     line_length
-        Number of chars in single line.
+        Number of terminal columns in single line.
 
     Examples
     --------
@@ -356,17 +839,24 @@ def topic_overview(topic: str, line_length: int) -> str:
     """
     if topic not in _goals:
         raise InvalidNameException(f"Could not find topic '{topic}'!")
+    return _rendered(f"topic {line_length} {topic}", lambda: _topic_overview(topic, line_length))
+
+
+def _topic_overview(topic: str, line_length: int) -> str:
+    import textwrap
 
     if topic == "Period":
         header = f"{topic}: {_history[-1].get_hours():.2g}/{sum(_to_work.values())}({sum(_remaining.values()):+.2g})"
-        header += "\n" + len(header) * "-" + "\n"
+        header += "\n" + helpers.display_width(header) * "-" + "\n"
     else:
         header = f"{topic}: {_history[-1].get_hours(topic):.2g}/{_to_work[topic]:.2g}({_remaining[topic]:+.2g})"
-        header += "\n" + len(header) * "-" + "\n"
+        header += "\n" + helpers.display_width(header) * "-" + "\n"
 
     goal_overview = ""
     for goal_ in _goals[topic]:
             goal_text = f"{goal_.name}\n"
+            if goal_.deadline is not None:
+                goal_text = f"{goal_.name} (until {history.format_timestamp(goal_.deadline)})\n"
             goal_text += textwrap.indent(
                 helpers.split_lines(goal_.description, line_length - 4),
                 " " * 4)
@@ -0,0 +1,275 @@
+"""Inverted index over names and descriptions of goals, used by `search`.
+
+The index maps each token (lowercased word) to the ids of the documents
+containing it. A document is a goal which is still open or a done/failed
+goal entry of a period. Documents are stored as columns of topic, name,
+status, period (index of period in history, -1 for open goals) and time
+(when the goal was added, done or failed).
+
+When a goal is done or failed its document is updated in place, when it is
+removed its status is set to REMOVED and it is skipped when searching.
+Removed documents are dropped when the index file is rewritten.
+
+The index is stored in name.index next to the schedule. The file starts
+with a header containing the version of the schedule it belongs to,
+followed by the columns of all documents and the ids of the documents
+of each token. Operations done since the file was written are appended
+as JSON lines, see `append`, so changing goals neither reads nor rewrites
+the whole index. An index file whose version does not match the schedule
+is not used, the index is rebuilt from goals and history instead.
+"""
+import re
+import struct
+from array import array
+
+import helpers
+
+MAGIC = b"WSSEARCH"
+_HEADER = struct.Struct("<8sqqI")  # magic, version of schedule, end of columns, number of appended operations
+_U32 = struct.Struct("<I")
+STATUSES = ["open", "done", "failed"]
+REMOVED = -1
+_NO_TIME = -2 ** 63
+LOG_LIMIT = 1000  # appended operations after which index file is rewritten
+_WORD = re.compile(r"\w+")
+
+
+def tokens(text: str) -> set:
+    return set(_WORD.findall(text.lower()))
+
+
+class SearchIndex:
+    """Inverted index of goals, see module docstring."""
+
+    def __init__(self):
+        self.topics = []
+        self.names = []
+        self.statuses = array("b")  # index into STATUSES or REMOVED
+        self.periods = array("q")
+        self.times = array("q")
+        self._spans = {}  # token -> (start, end) of ids of its documents in _ids, as read from index file
+        self._ids = array("I")
+        self._added = {}  # token -> ids of documents added since index was read
+        self._open = None  # (topic, name) -> id of document of open goal, built on first use
+        self.n_removed = 0
+        self.rewrite = True  # index file has to be rewritten instead of appended to
+
+    def _open_docs(self) -> dict:
+        if self._open is None:
+            self._open = {(self.topics[doc_id], self.names[doc_id]): doc_id
+                          for doc_id, status in enumerate(self.statuses) if status == 0}
+        return self._open
+
+    def _doc_ids(self, token: str) -> list:
+        start, end = self._spans.get(token, (0, 0))
+        return self._ids[start:end].tolist() + self._added.get(token, [])
+
+    def add(self, topic: str, name: str, description: str, status: str = "open", period: int = None,
+            timestamp: int = None) -> None:
+        doc_id = len(self.names)
+        self.topics.append(topic)
+        self.names.append(name)
+        self.statuses.append(STATUSES.index(status))
+        self.periods.append(-1 if period is None else period)
+        self.times.append(_NO_TIME if timestamp is None else timestamp)
+        for token in tokens(f"{name} {description}"):
+            self._added.setdefault(token, []).append(doc_id)
+        if status == "open":
+            self._open_docs()[(topic, name)] = doc_id
+
+    def close(self, topic: str, name: str, status: str, period: int, timestamp: int) -> None:
+        """Marks open goal as done or failed in period."""
+        doc_id = self._open_docs().pop((topic, name), None)
+        if doc_id is not None:
+            self.statuses[doc_id] = STATUSES.index(status)
+            self.periods[doc_id] = period
+            self.times[doc_id] = timestamp
+
+    def remove(self, topic: str, name: str) -> None:
+        """Removes open goal, done and failed goals stay in index."""
+        doc_id = self._open_docs().pop((topic, name), None)
+        if doc_id is not None:
+            self.statuses[doc_id] = REMOVED
+            self.n_removed += 1
+
+    def remove_topic(self, topic: str) -> None:
+        for topic_, name in [key for key in self._open_docs() if key[0] == topic]:
+            self.remove(topic_, name)
+
+    def search(self, terms: str, topic: str = None, since: int = None) -> list:
+        """Returns documents containing all tokens of terms, in the order they were added.
+
+        Parameters
+        ----------
+        topic
+            Only return goals of topic.
+        since
+            Seconds since epoch, only return goals added, done or failed
+            since then. Open goals with unknown time are always returned.
+
+        Returns
+        -------
+        List of [topic, name, status, period, timestamp], period and
+        timestamp are None if unknown.
+        """
+        query = tokens(terms)
+        if len(query) == 0:
+            return []
+        postings = sorted((self._doc_ids(token) for token in query), key=len)
+        results = []
+        for doc_id in sorted(set(postings[0]).intersection(*postings[1:])):
+            status, timestamp = self.statuses[doc_id], self.times[doc_id]
+            if status == REMOVED or (topic is not None and self.topics[doc_id] != topic) \
+                    or (since is not None and timestamp != _NO_TIME and timestamp < since):
+                continue
+            period = self.periods[doc_id]
+            results.append([self.topics[doc_id], self.names[doc_id], STATUSES[status],
+                            None if period < 0 else period, None if timestamp == _NO_TIME else timestamp])
+        return results
+
+
+def build(goals_: dict, history_) -> SearchIndex:
+    """Returns index of all goals of goals_ and all goal entries of history_.
+
+    Periods replaced by summaries only contribute names of their goals.
+    """
+    import history
+
+    index = SearchIndex()
+    for idx in range(len(history_)):
+        period = history_[idx]
+        for entry in period.goal_entries:
+            status = "done" if isinstance(entry, history.GoalDoneEntry) else "failed"
+            index.add(entry.topic, entry.goal_name, entry.description, status, idx, entry.timestamp)
+        for topic, name in getattr(period, "done_goals", []):
+            index.add(topic, name, "", "done", idx, period.start)
+        for topic, name in getattr(period, "failed_goals", []):
+            index.add(topic, name, "", "failed", idx, period.start)
+    for topic, goal_list in goals_.items():
+        for goal in goal_list:
+            index.add(topic, goal.name, goal.description)
+    return index
+
+
+def _strings(strings: list) -> bytes:
+    data = "\0".join(strings).encode()
+    return _U32.pack(len(data)) + data
+
+
+def _read_strings(data: bytes, offset: int) -> tuple:
+    length, = _U32.unpack_from(data, offset)
+    offset += _U32.size
+    strings = data[offset:offset + length].decode().split("\0") if length > 0 else []
+    return strings, offset + length
+
+
+def _read_column(typecode: str, data: bytes, offset: int, length: int) -> tuple:
+    column = array(typecode)
+    column.frombytes(data[offset:offset + length * column.itemsize])
+    return column, offset + length * column.itemsize
+
+
+def encode(index: SearchIndex, version: int) -> bytes:
+    """Returns index file containing all documents except removed ones."""
+    new_ids = array("I")  # id of each document in index file
+    keep = []  # ids of documents which are not removed
+    for doc_id, status in enumerate(index.statuses):
+        new_ids.append(len(keep))
+        if status != REMOVED:
+            keep.append(doc_id)
+    token_list = []
+    counts = array("I")
+    ids = array("I")
+    for token in set(index._spans) | set(index._added):
+        doc_ids = index._doc_ids(token)
+        if index.n_removed > 0:
+            doc_ids = [new_ids[doc_id] for doc_id in doc_ids if index.statuses[doc_id] != REMOVED]
+        if len(doc_ids) > 0:
+            token_list.append(token)
+            counts.append(len(doc_ids))
+            ids.extend(doc_ids)
+
+    body = b"".join([
+        _U32.pack(len(keep)),
+        _strings([index.topics[doc_id] for doc_id in keep]),
+        _strings([index.names[doc_id] for doc_id in keep]),
+        array("b", [index.statuses[doc_id] for doc_id in keep]).tobytes(),
+        array("q", [index.periods[doc_id] for doc_id in keep]).tobytes(),
+        array("q", [index.times[doc_id] for doc_id in keep]).tobytes(),
+        _strings(token_list),
+        counts.tobytes(),
+        ids.tobytes(),
+    ])
+    return _HEADER.pack(MAGIC, version, _HEADER.size + len(body), 0) + body
+
+
+def decode(data: bytes) -> SearchIndex:
+    """Returns index stored in index file data, including appended operations."""
+    import json
+
+    _, _, end, n_logged = _HEADER.unpack_from(data)
+    index = SearchIndex()
+    n_docs, = _U32.unpack_from(data, _HEADER.size)
+    index.topics, offset = _read_strings(data, _HEADER.size + _U32.size)
+    index.names, offset = _read_strings(data, offset)
+    index.statuses, offset = _read_column("b", data, offset, n_docs)
+    index.periods, offset = _read_column("q", data, offset, n_docs)
+    index.times, offset = _read_column("q", data, offset, n_docs)
+    token_list, offset = _read_strings(data, offset)
+    counts, offset = _read_column("I", data, offset, len(token_list))
+    index._ids, offset = _read_column("I", data, offset, sum(counts))
+    start = 0
+    for token, count in zip(token_list, counts):
+        index._spans[token] = (start, start + count)
+        start += count
+
+    for line in data[end:].splitlines():
+        method, *args = json.loads(line)
+        getattr(index, method)(*args)
+    index.rewrite = n_logged > LOG_LIMIT or index.n_removed > n_docs // 2
+    return index
+
+
+def read(path: str, version: int) -> SearchIndex:
+    """Returns index stored at path, or None if there is none for version of schedule."""
+    try:
+        with open(path, "rb") as file:
+            data = file.read()
+    except FileNotFoundError:
+        return None
+    if len(data) < _HEADER.size or _HEADER.unpack_from(data)[:2] != (MAGIC, version):
+        return None
+    return decode(data)
+
+
+def write(path: str, index: SearchIndex, version: int) -> None:
+    helpers.atomic_write(path, encode(index, version))
+
+
+def append(path: str, operations: list, old_version: int, version: int) -> int:
+    """Appends operations (method name and arguments of `SearchIndex`) to index file at path.
+
+    Nothing is appended if index file does not belong to old_version of
+    schedule. Returns number of operations appended since file was
+    written, -1 if nothing was appended.
+    """
+    import json
+
+    try:
+        file = open(path, "r+b")
+    except FileNotFoundError:
+        return -1
+    with file:
+        header = file.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            return -1
+        magic, file_version, end, n_logged = _HEADER.unpack(header)
+        if (magic, file_version) != (MAGIC, old_version):
+            return -1
+        if len(operations) > 0:
+            file.seek(0, 2)
+            file.write("".join(json.dumps(operation) + "\n" for operation in operations).encode())
+            file.flush()
+        file.seek(0)
+        file.write(_HEADER.pack(MAGIC, version, end, n_logged + len(operations)))
+    return n_logged + len(operations)
@@ -0,0 +1,330 @@
+import json
+import os
+import sqlite3
+from collections.abc import Sequence
+from datetime import datetime
+
+import goals
+import history
+import timer
+from history import GoalDoneEntry, GoalFailEntry, WorkEntry
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS topics (
+    name TEXT PRIMARY KEY, to_work REAL, remaining REAL, position INTEGER);
+CREATE TABLE IF NOT EXISTS goals (
+    topic TEXT, name TEXT, description TEXT, periodic INTEGER, deadline INTEGER,
+    PRIMARY KEY (topic, name));
+CREATE TABLE IF NOT EXISTS periods (
+    id INTEGER PRIMARY KEY, start INTEGER, to_work TEXT, remaining TEXT);
+CREATE TABLE IF NOT EXISTS work_entries (
+    period INTEGER, topic TEXT, date INTEGER, hours REAL);
+CREATE TABLE IF NOT EXISTS goal_entries (
+    period INTEGER, topic TEXT, date INTEGER, goal_name TEXT, description TEXT,
+    periodic INTEGER, done INTEGER);
+CREATE TABLE IF NOT EXISTS todo (
+    position INTEGER PRIMARY KEY, topic TEXT, goal TEXT);
+CREATE TABLE IF NOT EXISTS timer (
+    topic TEXT, tic TEXT);
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY, value TEXT);
+CREATE INDEX IF NOT EXISTS work_period_topic ON work_entries (period, topic);
+CREATE INDEX IF NOT EXISTS work_date ON work_entries (date);
+CREATE INDEX IF NOT EXISTS goal_period_topic ON goal_entries (period, topic);
+CREATE INDEX IF NOT EXISTS goal_date ON goal_entries (date);
+CREATE INDEX IF NOT EXISTS goal_deadline ON goals (deadline) WHERE deadline IS NOT NULL;
+"""
+
+
+class SqlPeriod:
+    """A period whose entries are stored in database.
+
+    Behaves like history.Period, but hours are computed by aggregate queries.
+    Added entries are kept in memory until `flush` is called, so no write
+    transaction is open while a command is executed.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, period_id: int, start: int, to_work: dict = None,
+                 remaining: dict = None):
+        self.conn = conn
+        self.id = period_id
+        self.start = start
+        self.to_work = to_work  # to_work and remaining of schedule when period was closed
+        self.remaining = remaining
+        self.new_entries = []
+        self._closed = False  # to_work and remaining changed since flush
+
+    @property
+    def work_entries(self) -> list:
+        rows = self.conn.execute(
+            "SELECT topic, date, hours FROM work_entries WHERE period = ? ORDER BY rowid",
+            (self.id,))
+        return [WorkEntry(topic, hours, date) for topic, date, hours in rows] \
+            + [entry for entry in self.new_entries if isinstance(entry, WorkEntry)]
+
+    @property
+    def goal_entries(self) -> list:
+        rows = self.conn.execute(
+            "SELECT topic, date, goal_name, description, periodic, done FROM goal_entries "
+            "WHERE period = ? ORDER BY rowid", (self.id,))
+        entries = []
+        for topic, date, goal_name, description, periodic, done in rows:
+            entry_cls = GoalDoneEntry if done else GoalFailEntry
+            entries.append(entry_cls(topic, goal_name, description, bool(periodic), date))
+        return entries + [entry for entry in self.new_entries if isinstance(entry, history.GoalEntry)]
+
+    def add_entry(self, entry: history.Entry) -> None:
+        """Adds an entry to period."""
+        self.new_entries.append(entry)
+
+    def close(self, to_work: dict, remaining: dict) -> None:
+        """Records to_work and remaining hours of schedule at end of period."""
+        self.to_work = dict(to_work)
+        self.remaining = dict(remaining)
+        self._closed = True
+
+    def flush(self) -> None:
+        """Inserts added entries into database."""
+        for entry in self.new_entries:
+            _insert_entry(self.conn, self.id, entry)
+        self.new_entries.clear()
+        if self._closed:
+            self.conn.execute("UPDATE periods SET to_work = ?, remaining = ? WHERE id = ?",
+                              (_hours(self.to_work), _hours(self.remaining), self.id))
+            self._closed = False
+
+    def get_hours(self, topic: str = None) -> float:
+        """Returns number of hours worked.
+
+        Parameters
+        ----------
+        topic
+            Topic for which worked hours are returned. If None all hours worked are returned."""
+        if topic is None:
+            row = self.conn.execute(
+                "SELECT SUM(hours) FROM work_entries WHERE period = ?", (self.id,)).fetchone()
+        else:
+            row = self.conn.execute(
+                "SELECT SUM(hours) FROM work_entries WHERE period = ? AND topic = ?",
+                (self.id, topic)).fetchone()
+        new_hours = sum(entry.hours for entry in self.new_entries
+                        if isinstance(entry, WorkEntry) and topic in [None, entry.topic])
+        return (row[0] or 0) + new_hours
+
+    def get_day_hours(self, day: str, topic: str = None) -> float:
+        """Returns number of hours worked on day (YYYY-MM-DD), on topic or on all topics."""
+        day_start, day_end = history.day_bounds(day)
+        row = self.conn.execute(
+            "SELECT SUM(hours) FROM work_entries WHERE period = ? AND date >= ? AND date < ?"
+            + ("" if topic is None else " AND topic = ?"),
+            (self.id, day_start, day_end) + (() if topic is None else (topic,))).fetchone()
+        new_hours = sum(entry.hours for entry in self.new_entries
+                        if isinstance(entry, WorkEntry) and topic in [None, entry.topic]
+                        and history.day_of(entry.timestamp) == day)
+        return (row[0] or 0) + new_hours
+
+    @property
+    def hours(self) -> dict:
+        """Hours worked per topic."""
+        hours = dict(self.conn.execute(
+            "SELECT topic, SUM(hours) FROM work_entries WHERE period = ? GROUP BY topic", (self.id,)))
+        for entry in self.new_entries:
+            if isinstance(entry, WorkEntry):
+                hours[entry.topic] = hours.get(entry.topic, 0) + entry.hours
+        return hours
+
+    @property
+    def goals_done(self) -> dict:
+        """Number of goals marked as done per topic."""
+        return self._count_goals(True)
+
+    @property
+    def goals_failed(self) -> dict:
+        """Number of failed goals per topic."""
+        return self._count_goals(False)
+
+    def _count_goals(self, done: bool) -> dict:
+        counts = dict(self.conn.execute(
+            "SELECT topic, COUNT(*) FROM goal_entries WHERE period = ? AND done = ? GROUP BY topic",
+            (self.id, done)))
+        entry_cls = GoalDoneEntry if done else GoalFailEntry
+        for entry in self.new_entries:
+            if isinstance(entry, entry_cls):
+                counts[entry.topic] = counts.get(entry.topic, 0) + 1
+        return counts
+
+    def to_period(self) -> history.Period:
+        """Returns period as history.Period."""
+        period = history.Period()
+        period.start = self.start
+        for entry in self.work_entries + self.goal_entries:
+            period.add_entry(entry)
+        if self.to_work is not None:
+            period.close(self.to_work, self.remaining)
+        return period
+
+
+class SqlHistory(Sequence):
+    """List of periods stored in database.
+
+    Appended periods are kept in memory until `flush` is called.
+    """
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.n_stored = conn.execute("SELECT COUNT(*) FROM periods").fetchone()[0]
+        self.new_periods = []
+        self._periods = {}  # SqlPeriod of each accessed period, they may contain new entries
+
+    def __len__(self) -> int:
+        return self.n_stored + len(self.new_periods)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("period index out of range")
+
+        if idx >= self.n_stored:
+            return self.new_periods[idx - self.n_stored]
+        if idx not in self._periods:
+            start, to_work, remaining = self.conn.execute(
+                "SELECT start, to_work, remaining FROM periods WHERE id = ?", (idx,)).fetchone()
+            self._periods[idx] = SqlPeriod(self.conn, idx, start, _read_hours(to_work), _read_hours(remaining))
+        return self._periods[idx]
+
+    def append(self, period: history.Period) -> None:
+        self.new_periods.append(period)
+
+    def flush(self) -> None:
+        """Inserts new periods and entries into database, without committing."""
+        for period in self._periods.values():
+            period.flush()
+        for period in self.new_periods:
+            _insert_period(self.conn, self.n_stored, period)
+            self.n_stored += 1
+        self.new_periods.clear()
+
+    def to_list(self) -> list:
+        """Returns all periods as list of history.Period."""
+        return [period if isinstance(period, history.Period) else period.to_period() for period in self]
+
+
+def _hours(hours: dict) -> str:
+    return None if hours is None else json.dumps(hours)
+
+
+def _read_hours(text: str) -> dict:
+    return None if text is None else json.loads(text)
+
+
+def _insert_entry(conn: sqlite3.Connection, period_id: int, entry: history.Entry) -> None:
+    if isinstance(entry, WorkEntry):
+        conn.execute(
+            "INSERT INTO work_entries VALUES (?, ?, ?, ?)",
+            (period_id, entry.topic, entry.timestamp, entry.hours))
+    elif isinstance(entry, history.GoalEntry):
+        conn.execute(
+            "INSERT INTO goal_entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (period_id, entry.topic, entry.timestamp, entry.goal_name,
+             entry.description, entry.periodic, isinstance(entry, GoalDoneEntry)))
+
+
+def _insert_period(conn: sqlite3.Connection, period_id: int, period: history.Period) -> None:
+    conn.execute("INSERT INTO periods VALUES (?, ?, ?, ?)",
+                 (period_id, period.start, _hours(getattr(period, "to_work", None)),
+                  _hours(getattr(period, "remaining", None))))
+    for entry in period.work_entries + period.goal_entries:
+        _insert_entry(conn, period_id, entry)
+
+
+def read(path: str) -> list:
+    """Reads schedule from database.
+
+    Returns [to_work, remaining, goals, work_timer, history, todo, settings, deadlines],
+    where history is a SqlHistory bound to an open connection.
+    """
+    conn = sqlite3.connect(path, timeout=30)
+    # add columns and tables missing in databases created by older versions
+    if "deadline" not in [row[1] for row in conn.execute("PRAGMA table_info(goals)")]:
+        conn.execute("ALTER TABLE goals ADD COLUMN deadline INTEGER")
+    if "to_work" not in [row[1] for row in conn.execute("PRAGMA table_info(periods)")]:
+        conn.execute("ALTER TABLE periods ADD COLUMN to_work TEXT")
+        conn.execute("ALTER TABLE periods ADD COLUMN remaining TEXT")
+    conn.executescript(SCHEMA)
+    to_work = {}
+    remaining = {}
+    goals_ = {"Period": goals.GoalList()}
+    for name, to_work_, remaining_ in conn.execute(
+            "SELECT name, to_work, remaining FROM topics ORDER BY position"):
+        to_work[name] = to_work_
+        remaining[name] = remaining_
+        goals_[name] = goals.GoalList()
+    for topic, name, description, periodic, deadline in conn.execute(
+            "SELECT topic, name, description, periodic, deadline FROM goals ORDER BY rowid"):
+        goals_[topic].add(goals.Goal(name, description, bool(periodic), deadline))
+    # a sorted list is a valid heap
+    deadlines = list(conn.execute(
+        "SELECT deadline, topic, name FROM goals WHERE deadline IS NOT NULL ORDER BY deadline, topic, name"))
+
+    work_timer = timer.Timer()
+    row = conn.execute("SELECT topic, tic FROM timer").fetchone()
+    if row is not None:
+        work_timer.topic = row[0]
+        work_timer.tic = datetime.fromisoformat(row[1])
+
+    todo = [(topic, goal) for topic, goal in conn.execute(
+        "SELECT topic, goal FROM todo ORDER BY position")]
+    settings = {key: json.loads(value) for key, value in conn.execute("SELECT key, value FROM settings")}
+    return [to_work, remaining, goals_, work_timer, SqlHistory(conn), todo, settings, deadlines]
+
+
+def write_state(history_: SqlHistory, to_work: dict, remaining: dict, goals_: dict,
+                work_timer: timer.Timer, todo: list, settings: dict) -> None:
+    """Writes new periods and entries and everything except history to database and commits."""
+    conn = history_.conn
+    history_.flush()
+    conn.execute("DELETE FROM topics")
+    conn.executemany(
+        "INSERT INTO topics VALUES (?, ?, ?, ?)",
+        [(topic, hours, remaining[topic], pos) for pos, (topic, hours) in enumerate(to_work.items())])
+    conn.execute("DELETE FROM goals")
+    conn.executemany(
+        "INSERT INTO goals VALUES (?, ?, ?, ?, ?)",
+        [(topic, goal.name, goal.description, goal.periodic, goal.deadline)
+         for topic, goal_list in goals_.items() for goal in goal_list])
+    conn.execute("DELETE FROM timer")
+    if work_timer.topic is not None:
+        conn.execute(
+            "INSERT INTO timer VALUES (?, ?)",
+            (work_timer.topic, work_timer.tic.isoformat()))
+    conn.execute("DELETE FROM todo")
+    conn.executemany(
+        "INSERT INTO todo VALUES (?, ?, ?)",
+        [(pos, topic, goal) for pos, (topic, goal) in enumerate(todo)])
+    conn.execute("DELETE FROM settings")
+    conn.executemany(
+        "INSERT INTO settings VALUES (?, ?)", [(key, json.dumps(value)) for key, value in settings.items()])
+    conn.commit()
+
+
+def write(path: str, to_work: dict, remaining: dict, goals_: dict, work_timer: timer.Timer,
+          history_: list, todo: list, settings: dict) -> None:
+    """Writes a complete schedule to a new database at path.
+
+    Database is created next to path and renamed when it is complete.
+    """
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript(SCHEMA)
+        for period_id, period in enumerate(history_):
+            _insert_period(conn, period_id, period)
+        write_state(SqlHistory(conn), to_work, remaining, goals_, work_timer, todo, settings)
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
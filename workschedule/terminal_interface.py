@@ -1,8 +1,9 @@
+import profiling  # first, so the import phase of a profiled command includes all imports
 import argparse
-import ctypes
+import os
 import sys
-from datetime import datetime
 
+import helpers
 import schedule
 from schedule import InvalidNameException, DuplicateNameException, NoScheduleException
 from timer import TimerRunningException
@@ -10,8 +11,12 @@ from timer import TimerRunningException
 LINE_LENGTH = 60
 
 
+class BatchException(Exception): pass
+
+
 def exeption_handler(err: Exception) -> None:
-    if type(err) in [InvalidNameException, DuplicateNameException, TimerRunningException, NoScheduleException]:
+    if type(err) in [InvalidNameException, DuplicateNameException, TimerRunningException, NoScheduleException,
+                     BatchException]:
         print(str(err))
     else:
         raise err
@@ -26,6 +31,8 @@ def remove_topic_handler(args) -> None:
 
 
 def work_parser_handler(args) -> None:
+    from datetime import datetime
+
     if args.topic is args.hours is None:
         topic, hours = schedule.stop_worktimer()
         print(f"[{datetime.now().strftime('%H:%M')}] Stoped work-timer. Worked {hours:.2f} hours on {topic}.")
@@ -41,8 +48,20 @@ def goal_add_handler(args) -> None:
         print(f"Name can not be longer than {LINE_LENGTH} chars.")
         return
 
-    description = input("Enter description: ").rstrip()
-    schedule.add_goal(args.topic, args.name, description, args.periodic)
+    if args.description is None:
+        description = input("Enter description: ").rstrip()
+    else:
+        description = args.description
+    deadline = None
+    if args.deadline is not None:
+        import history
+        from datetime import datetime
+
+        if len(args.deadline) == 10:  # date only, goal can be done until end of day
+            deadline = history.day_bounds(args.deadline)[1]
+        else:
+            deadline = int(datetime.fromisoformat(args.deadline).timestamp())
+    schedule.add_goal(args.topic, args.name, description, args.periodic, deadline)
 
 
 def done_goal_handler(args) -> None:
@@ -66,15 +85,176 @@ def set_active(name: str) -> None:
     print(f"Set {name} as active.")
 
 
-def view_parser_handler(args) -> None:
+def convert_parser_handler(args) -> None:
+    schedule.set_storage(args.format)
+    print(f"Schedule is now stored as '{args.format}'.")
+
+
+def period_parser_handler(args) -> None:
+    if args.days is not None:
+        schedule.set_setting("period_days", args.days)
+    if args.carry is not None:
+        schedule.set_setting("carry_topics", args.carry)
+    days = schedule._settings.get("period_days")
+    if days:
+        print(f"Periods last {days} days, carrying hours of: {', '.join(schedule._settings.get('carry_topics', []))}")
+    else:
+        print("Periods are only reset manually.")
+    n_started = schedule.rollover()
+    if n_started > 0:
+        print(f"Started {n_started} new periods.")
+
+
+def compact_parser_handler(args) -> None:
+    if args.auto:
+        schedule.set_setting("keep_periods", args.keep)
+    n_compacted = schedule.compact(args.keep)
+    print(f"Compacted {n_compacted} periods.")
+
+
+def run_batch(lines: list) -> list:
+    """Executes one command per line on the currently loaded schedule.
+
+    Empty lines and lines starting with '#' are skipped. Execution continues
+    after a failing command, so all errors are reported at once.
+
+    Returns
+    -------
+    List of error messages, prefixed with line number.
+    """
+    import contextlib
+    import io
+    import shlex
+
+    errors = []
+    for line_nr, line in enumerate(lines, start=1):
+        line = line.strip()
+        if line == "" or line.startswith("#"):
+            continue
+        stderr = io.StringIO()
+        try:
+            argv = shlex.split(line)
+            if argv[0] in ["set", "new", "serve", "batch", "watch"]:
+                raise BatchException(f"'{argv[0]}' can not be used in a batch!")
+            with contextlib.redirect_stderr(stderr):
+                args = parse_args(argv)
+            if getattr(args, "description", "") is None:  # don't prompt for goal description
+                args.description = ""
+            args.func(args)
+        except SystemExit:  # raised by argparse on invalid arguments
+            messages = stderr.getvalue().strip().splitlines()  # empty e.g. for --help
+            errors.append(f"line {line_nr}: {messages[-1] if messages else 'failed'}")
+        except Exception as err:
+            errors.append(f"line {line_nr}: {err}")
+    return errors
+
+
+def batch_parser_handler(args) -> None:
+    if args.text is not None:
+        lines = args.text.splitlines()
+    elif args.file == "-":
+        lines = sys.stdin.readlines()
+    else:
+        with open(args.file, "rt") as file:
+            lines = file.readlines()
+
+    errors = run_batch(lines)
+    if len(errors) > 0:
+        raise BatchException("\n".join(errors + ["Batch failed, no changes were saved."]))
+
+
+def report_parser_handler(args) -> None:
+    import report
+
+    names = None if args.all else [schedule.get_active_schedule()]
+    print(report.report(names, as_json=args.json))
+
+
+def export_parser_handler(args) -> None:
+    import export
+    import history
+    from datetime import datetime
+
+    since = None if args.since is None else datetime.fromisoformat(args.since)
+    history_ = schedule._history
+    if args.archived:
+        history_ = history.with_raw_periods(history_, schedule.raw_archive_path(schedule.get_active_schedule()))
+    rows = export.rows(history_, since, args.topic)
+    if args.output is None:
+        export.WRITERS[args.format](rows, sys.stdout)
+    else:
+        with open(args.output, "wt", newline="") as file:
+            export.WRITERS[args.format](rows, file)
+
+
+def search_parser_handler(args) -> None:
+    import history
+    from datetime import datetime
+
+    since = None if args.since is None else int(datetime.fromisoformat(args.since).timestamp())
+    results = schedule.search(" ".join(args.terms), args.topic, since)
+    for topic, name, status, period, timestamp in results:
+        line = f"{topic}: {name}"
+        if status != "open":
+            line += f" ({status} {history.day_of(timestamp)}, period {period})"
+        print(line)
+    if len(results) == 0:
+        print("No goals found.")
+
+
+def _enable_ansi() -> None:
     # enable virtual terminal sequences
     # Reference: https://docs.microsoft.com/en-us/windows/console/getstdhandle
-    kernel32 = ctypes.windll.kernel32
-    kernel32.SetConsoleMode(kernel32.GetStdHandle(-11), 7)
-    if args.topic is None:
-        print(schedule.overview())
+    if os.name == "nt":
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        kernel32.SetConsoleMode(kernel32.GetStdHandle(-11), 7)
+
+
+def stats_parser_handler(args) -> None:
+    import analytics
+
+    topics, matrix = analytics.series(schedule._history, args.stat, args.window, schedule._to_work)
+    if args.topic is not None:
+        if args.topic not in topics:
+            raise InvalidNameException(f"Could not find topic '{args.topic}' in history!")
+        matrix = matrix[:, [topics.index(args.topic)]]
+        topics = [args.topic]
+    if args.periods is not None:
+        matrix = matrix[-args.periods:]
+    if args.plot is None:
+        print(analytics.text_report(topics, matrix))
     else:
-        print(schedule.topic_overview(args.topic, LINE_LENGTH))
+        analytics.plot(topics, matrix, args.stat, args.plot)
+        print(f"Saved plot to {args.plot}.")
+
+
+def view_parser_handler(args) -> None:
+    _enable_ansi()
+    if args.day is not None:
+        hours = {topic: schedule.hours_on(args.day, topic) for topic in schedule._to_work}
+        print("\n".join([f"{args.day}: {sum(hours.values()):.2g}"]
+                        + [f"{topic}: {hours_:.2g}" for topic, hours_ in hours.items()]))
+    elif args.topic is None:
+        with profiling.phase("render"):
+            text = schedule.overview(LINE_LENGTH // 2)
+        print(text)
+    else:
+        with profiling.phase("render"):
+            text = schedule.topic_overview(args.topic, LINE_LENGTH)
+        print(text)
+
+
+def watch_parser_handler(args) -> None:
+    import asyncio
+    import watch
+
+    _enable_ansi()
+    try:
+        asyncio.run(watch.watch(schedule.get_active_schedule(), tick=args.tick, poll=args.poll,
+                                cell_length=LINE_LENGTH // 2))
+    except KeyboardInterrupt:
+        pass
 
 
 def view_todo_handler(args) -> None:
@@ -101,76 +281,231 @@ def done_todo_handler(args) -> None:
     schedule.reset_todo(True)
 
 
-main_parser = argparse.ArgumentParser(description="subparsers")
-main_parser.set_defaults(func=lambda x: print(f"Active schedule is '{schedule.get_active_schedule()}'"))
-subparsers = main_parser.add_subparsers()
+def _add_view_parser(subparsers) -> None:
+    overview_parser = subparsers.add_parser("view")
+    overview_parser.add_argument("topic", default=None, type=str, nargs="?")
+    overview_parser.add_argument("-d", "--day", type=str, default=None, help="show hours worked on day YYYY-MM-DD")
+    overview_parser.set_defaults(func=view_parser_handler)
+
+
+def _add_watch_parser(subparsers) -> None:
+    watch_parser = subparsers.add_parser("watch")
+    watch_parser.add_argument("-t", "--tick", type=float, default=1.0, help="seconds between updates of timer")
+    watch_parser.add_argument("-p", "--poll", type=float, default=1.0,
+                              help="seconds between checks for changes of schedule")
+    watch_parser.set_defaults(func=watch_parser_handler)
+
+
+def _add_work_parser(subparsers) -> None:
+    work_parser = subparsers.add_parser("work")
+    work_parser.add_argument("topic", type=str, default=None, nargs="?")
+    work_parser.add_argument("hours", type=float, default=None, nargs="?")
+    work_parser.set_defaults(func=work_parser_handler)
+
 
-overview_parser = subparsers.add_parser("view")
-overview_parser.add_argument("topic", default=None, type=str, nargs="?")
-overview_parser.set_defaults(func=view_parser_handler)
+def _add_add_topic_parser(subparsers) -> None:
+    add_topic_parser = subparsers.add_parser("add")
+    add_topic_parser.add_argument("topic", type=str)
+    add_topic_parser.add_argument("hours", type=float)
+    add_topic_parser.set_defaults(func=add_topic_handler)
 
-work_parser = subparsers.add_parser("work")
-work_parser.add_argument("topic", type=str, default=None, nargs="?")
-work_parser.add_argument("hours", type=float, default=None, nargs="?")
-work_parser.set_defaults(func=work_parser_handler)
 
-add_topic_parser = subparsers.add_parser("add")
-add_topic_parser.add_argument("topic", type=str)
-add_topic_parser.add_argument("hours", type=float)
-add_topic_parser.set_defaults(func=add_topic_handler)
+def _add_remove_topic_parser(subparsers) -> None:
+    remove_topic_parser = subparsers.add_parser("remove")
+    remove_topic_parser.add_argument("topic", type=str)
+    remove_topic_parser.set_defaults(func=remove_topic_handler)
 
-remove_topic_parser = subparsers.add_parser("remove")
-remove_topic_parser.add_argument("topic", type=str)
-remove_topic_parser.set_defaults(func=remove_topic_handler)
 
-reset_parser = subparsers.add_parser("reset")
-reset_parser.add_argument("topics", type=str, nargs="*")
-reset_parser.set_defaults(func=reset_parser_handler)
+def _add_reset_parser(subparsers) -> None:
+    reset_parser = subparsers.add_parser("reset")
+    reset_parser.add_argument("topics", type=str, nargs="*")
+    reset_parser.set_defaults(func=reset_parser_handler)
 
-load_parser = subparsers.add_parser("set")
-load_parser.add_argument("name", type=str)
 
-new_schedule_parser = subparsers.add_parser("new")
-new_schedule_parser.add_argument("name", type=str)
+def _add_set_parser(subparsers) -> None:
+    load_parser = subparsers.add_parser("set")
+    load_parser.add_argument("name", type=str)
 
-goal_parser = subparsers.add_parser("goal")
-goal_subparsers = goal_parser.add_subparsers()
 
-goal_add_parser = goal_subparsers.add_parser("add")
-goal_add_parser.add_argument("topic", type=str)
-goal_add_parser.add_argument("name", type=str)
-goal_add_parser.add_argument("-p", "--periodic", default=False, action="store_true")
-goal_add_parser.set_defaults(func=goal_add_handler)
+def _add_new_parser(subparsers) -> None:
+    new_schedule_parser = subparsers.add_parser("new")
+    new_schedule_parser.add_argument("name", type=str)
 
-goal_remove_parser = goal_subparsers.add_parser("remove")
-goal_remove_parser.add_argument("topic", type=str)
-goal_remove_parser.add_argument("name", type=str)
-goal_remove_parser.set_defaults(func=remove_goal_handler)
 
-goal_done_parser = goal_subparsers.add_parser("done")
-goal_done_parser.add_argument("topic", type=str)
-goal_done_parser.add_argument("name", type=str)
-goal_done_parser.set_defaults(func=done_goal_handler)
+def _add_serve_parser(subparsers) -> None:
+    serve_parser = subparsers.add_parser("serve")
+    serve_parser.add_argument("-i", "--interval", type=float, default=60.0)
+    serve_parser.add_argument("--stop", default=False, action="store_true")
 
-todo_main_parser = subparsers.add_parser("todo")
-todo_main_parser.set_defaults(func=view_todo_handler)
-todo_subparsers = todo_main_parser.add_subparsers()
 
-todo_add_parser = todo_subparsers.add_parser("add")
-todo_add_parser.add_argument("topic", type=str)
-todo_add_parser.add_argument("goal", type=str)
-todo_add_parser.add_argument("-i", "--pos", type=int, default=None)
-todo_add_parser.set_defaults(func=add_todo_handler)
+def _add_batch_parser(subparsers) -> None:
+    batch_parser = subparsers.add_parser("batch")
+    batch_parser.add_argument("file", type=str, default="-", nargs="?")
+    batch_parser.add_argument("--text", type=str, default=None, help=argparse.SUPPRESS)  # used by client
+    batch_parser.set_defaults(func=batch_parser_handler)
 
-todo_remove_parser = todo_subparsers.add_parser("rm")
-todo_remove_parser.add_argument("-i", "--pos", type=int, default=None)
-todo_remove_parser.set_defaults(func=remove_todo_handler)
 
-todo_done_parser = todo_subparsers.add_parser("done")
-todo_done_parser.set_defaults(func=done_todo_handler)
+def _add_report_parser(subparsers) -> None:
+    report_parser = subparsers.add_parser("report")
+    report_parser.add_argument("-a", "--all", default=False, action="store_true")
+    report_parser.add_argument("--json", default=False, action="store_true")
+    report_parser.set_defaults(func=report_parser_handler)
+
+
+def _add_export_parser(subparsers) -> None:
+    export_parser = subparsers.add_parser("export")
+    export_parser.add_argument("-f", "--format", type=str, default="csv", choices=["csv", "jsonl"])
+    export_parser.add_argument("--since", type=str, default=None, help="date as YYYY-MM-DD")
+    export_parser.add_argument("--topic", type=str, default=None)
+    export_parser.add_argument("-o", "--output", type=str, default=None)
+    export_parser.add_argument("--archived", default=False, action="store_true",
+                               help="include entries of compacted periods")
+    export_parser.set_defaults(func=export_parser_handler)
+
+
+def _add_convert_parser(subparsers) -> None:
+    convert_parser = subparsers.add_parser("convert")
+    convert_parser.add_argument("format", type=str, choices=schedule.STORAGE_MODES)
+    convert_parser.set_defaults(func=convert_parser_handler)
+
+
+def _add_period_parser(subparsers) -> None:
+    period_parser = subparsers.add_parser("period")
+    period_parser.add_argument("-d", "--days", type=int, default=None,
+                               help="length of periods in days, 0 disables automatic reset")
+    period_parser.add_argument("-c", "--carry", type=str, nargs="*", default=None,
+                               help="topics whose unworked hours are carried to next period")
+    period_parser.set_defaults(func=period_parser_handler)
+
+
+def _add_compact_parser(subparsers) -> None:
+    compact_parser = subparsers.add_parser("compact")
+    compact_parser.add_argument("-k", "--keep", type=int, default=3, help="number of periods kept raw")
+    compact_parser.add_argument("--auto", default=False, action="store_true", help="compact on each reset")
+    compact_parser.set_defaults(func=compact_parser_handler)
+
+
+def _add_stats_parser(subparsers) -> None:
+    stats_parser = subparsers.add_parser("stats")
+    stats_parser.add_argument("stat", type=str, default="hours", nargs="?",
+                              choices=["hours", "done", "failed", "deficit"])
+    stats_parser.add_argument("-w", "--window", type=int, default=1, help="average over this many periods")
+    stats_parser.add_argument("-n", "--periods", type=int, default=None, help="only show last n periods")
+    stats_parser.add_argument("--topic", type=str, default=None)
+    stats_parser.add_argument("--plot", type=str, default=None, help="save plot to file, needs matplotlib")
+    stats_parser.set_defaults(func=stats_parser_handler)
+
+
+def _add_search_parser(subparsers) -> None:
+    search_parser = subparsers.add_parser("search")
+    search_parser.add_argument("terms", type=str, nargs="+")
+    search_parser.add_argument("--topic", type=str, default=None)
+    search_parser.add_argument("--since", type=str, default=None, help="date as YYYY-MM-DD")
+    search_parser.set_defaults(func=search_parser_handler)
+
+
+def _add_goal_parser(subparsers) -> None:
+    goal_parser = subparsers.add_parser("goal")
+    goal_subparsers = goal_parser.add_subparsers()
+
+    goal_add_parser = goal_subparsers.add_parser("add")
+    goal_add_parser.add_argument("topic", type=str)
+    goal_add_parser.add_argument("name", type=str)
+    goal_add_parser.add_argument("-p", "--periodic", default=False, action="store_true")
+    goal_add_parser.add_argument("-d", "--description", type=str, default=None)
+    goal_add_parser.add_argument("--deadline", type=str, default=None, help="YYYY-MM-DD[THH:MM]")
+    goal_add_parser.set_defaults(func=goal_add_handler)
+
+    goal_remove_parser = goal_subparsers.add_parser("remove")
+    goal_remove_parser.add_argument("topic", type=str)
+    goal_remove_parser.add_argument("name", type=str)
+    goal_remove_parser.set_defaults(func=remove_goal_handler)
+
+    goal_done_parser = goal_subparsers.add_parser("done")
+    goal_done_parser.add_argument("topic", type=str)
+    goal_done_parser.add_argument("name", type=str)
+    goal_done_parser.set_defaults(func=done_goal_handler)
+
+
+def _add_todo_parser(subparsers) -> None:
+    todo_main_parser = subparsers.add_parser("todo")
+    todo_main_parser.set_defaults(func=view_todo_handler)
+    todo_subparsers = todo_main_parser.add_subparsers()
+
+    todo_add_parser = todo_subparsers.add_parser("add")
+    todo_add_parser.add_argument("topic", type=str)
+    todo_add_parser.add_argument("goal", type=str)
+    todo_add_parser.add_argument("-i", "--pos", type=int, default=None)
+    todo_add_parser.set_defaults(func=add_todo_handler)
+
+    todo_remove_parser = todo_subparsers.add_parser("rm")
+    todo_remove_parser.add_argument("-i", "--pos", type=int, default=None)
+    todo_remove_parser.set_defaults(func=remove_todo_handler)
+
+    todo_done_parser = todo_subparsers.add_parser("done")
+    todo_done_parser.set_defaults(func=done_todo_handler)
+
+
+# Builds the subparser of each command, only the parser of the
+# command which is executed is built.
+PARSER_BUILDERS = {
+    "view": _add_view_parser,
+    "watch": _add_watch_parser,
+    "work": _add_work_parser,
+    "add": _add_add_topic_parser,
+    "remove": _add_remove_topic_parser,
+    "reset": _add_reset_parser,
+    "set": _add_set_parser,
+    "new": _add_new_parser,
+    "serve": _add_serve_parser,
+    "batch": _add_batch_parser,
+    "report": _add_report_parser,
+    "export": _add_export_parser,
+    "convert": _add_convert_parser,
+    "period": _add_period_parser,
+    "compact": _add_compact_parser,
+    "search": _add_search_parser,
+    "stats": _add_stats_parser,
+    "goal": _add_goal_parser,
+    "todo": _add_todo_parser,
+}
+_parsers = {}  # parsers already built, by command
+
+
+def build_parser(command: str = None) -> argparse.ArgumentParser:
+    """Returns parser containing subparser of command.
+
+    If command is None or unknown, parser contains subparsers of all commands,
+    so usage and error messages list every command.
+    """
+    if command in _parsers:
+        return _parsers[command]
+
+    main_parser = argparse.ArgumentParser(description="subparsers")
+    main_parser.set_defaults(func=lambda x: print(f"Active schedule is '{schedule.get_active_schedule()}'"))
+    subparsers = main_parser.add_subparsers()
+    if command in PARSER_BUILDERS:
+        PARSER_BUILDERS[command](subparsers)
+    else:
+        for add_parser in PARSER_BUILDERS.values():
+            add_parser(subparsers)
+    _parsers[command] = main_parser
+    return main_parser
+
+
+def parse_args(argv: list) -> argparse.Namespace:
+    command = argv[0] if len(argv) > 0 else None
+    return build_parser(command).parse_args(argv)
+
+
+def run(argv: list) -> None:
+    """Executes a command on the currently loaded schedule."""
+    args = parse_args(argv)
+    args.func(args)
 
 
 def main() -> None:
+    sys.argv[1:] = profiling.configure(sys.argv[1:])
     try:
         nargs = len(sys.argv)
         if nargs == 3 and sys.argv[1] == "set":
@@ -178,14 +513,35 @@ def main() -> None:
         elif nargs == 3 and sys.argv[1] == "new":
             schedule.new_schedule(sys.argv[2])
             set_active(sys.argv[2])
+        elif nargs >= 2 and sys.argv[1] == "serve":
+            args = parse_args(sys.argv[1:])
+            if args.stop:
+                print("There is no daemon running!")
+            else:
+                import daemon
+                daemon.serve(args.interval)
+        elif nargs >= 2 and sys.argv[1] in ["report", "watch"]:
+            # read schedules themselves, active schedule is neither loaded nor saved
+            with profiling.phase("parse"):
+                args = parse_args(sys.argv[1:])
+            with profiling.phase("command"):
+                args.func(args)
         else:
-            args = main_parser.parse_args()
-            name = schedule.get_active_schedule()
-            schedule.load(name)
-            args.func(args)
-            schedule.save(name)
+            with profiling.phase("parse"):
+                args = parse_args(sys.argv[1:])
+            with profiling.phase("load"):
+                name = schedule.get_active_schedule()
+                schedule.load(name)
+            with profiling.phase("command"):
+                args.func(args)
+            with profiling.phase("save"):
+                schedule.save(name)
+            profiling.record_schedule(name, os.path.join(helpers.get_top_directory(), "schedules"),
+                                      schedule._history)
     except Exception as err:
         exeption_handler(err)
+    finally:
+        profiling.finish()
 
 
 if __name__ == '__main__':
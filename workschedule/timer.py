@@ -1,4 +1,4 @@
-from datetime import datetime
+import helpers
 
 
 class TimerRunningException(Exception): pass
@@ -15,13 +15,15 @@ class Timer:
         if self.topic is not None:
             raise TimerRunningException(f"There is already a timer running on topic '{self.topic}'!")
         self.topic = topic
-        self.tic = datetime.now()
+        self.tic = helpers.now()
 
     def stop(self):
         if self.topic is None:
             raise TimerRunningException(f"There is no active timer!")
-        self.toc = datetime.now()
-        hours = (self.toc - self.tic).seconds / 3600
+        self.toc = helpers.now()
+        # seconds since epoch include days and are not affected by DST changes,
+        # if clock was set back while timer was running no time is counted
+        hours = max(self.toc.timestamp() - self.tic.timestamp(), 0) / 3600
         topic = self.topic
         self.topic = None
         return topic, hours
@@ -0,0 +1,108 @@
+"""Live dashboard of a schedule in the terminal, see `watch`.
+
+The overview table is only rendered again when the schedule was saved,
+which is detected by polling the modification time of name.lock (it is
+written on every save, in all storage modes), or when a new day starts.
+On every tick only the status line showing the running timer changes,
+and only lines which differ from what is on screen are written, so an
+idle dashboard uses almost no CPU.
+"""
+import asyncio
+import os
+import sys
+
+import helpers
+import schedule
+
+HIDE_CURSOR = "\033[?25l"
+SHOW_CURSOR = "\033[?25h"
+
+
+def redraw(old: list, new: list) -> str:
+    """Returns terminal output which changes a screen showing lines old to lines new.
+
+    Only lines which differ are written, each one after moving the cursor
+    to its row. Lines below the last new line are cleared.
+    """
+    parts = []
+    for row, line in enumerate(new):
+        if row >= len(old) or old[row] != line:
+            parts.append(f"\033[{row + 1};1H{line}\033[K")
+    if len(new) < len(old):
+        parts.append(f"\033[{len(new) + 1};1H\033[J")
+    return "".join(parts)
+
+
+def status_line(now) -> str:
+    """Returns current time and topic and elapsed time of running timer."""
+    work_timer = schedule._work_timer
+    if work_timer.topic is None:
+        return f"{now:%H:%M:%S}  no timer running"
+    seconds = int(max(now.timestamp() - work_timer.tic.timestamp(), 0))
+    return f"{now:%H:%M:%S}  working on {work_timer.topic} " \
+           f"for {seconds // 3600}:{seconds // 60 % 60:02}:{seconds % 60:02}"
+
+
+def _mtime(path: str) -> int:
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+
+async def _poll(path: str, changed: asyncio.Event, interval: float) -> None:
+    """Sets changed whenever modification time of file at path changes."""
+    mtime = _mtime(path)
+    while True:
+        await asyncio.sleep(interval)
+        new_mtime = _mtime(path)
+        if new_mtime != mtime:
+            mtime = new_mtime
+            changed.set()
+
+
+async def watch(name: str, root_dir: str = None, tick: float = 1.0, poll: float = 1.0,
+                cell_length: int = None, file=None) -> None:
+    """Shows overview of schedule name and running timer until cancelled.
+
+    The schedule is loaded again when it was saved by another process,
+    it is never saved by the dashboard.
+
+    Parameters
+    ----------
+    tick
+        Seconds between updates of status line.
+    poll
+        Seconds between checks whether schedule was saved.
+    cell_length
+        Passed to `schedule.overview`.
+    """
+    if root_dir is None:
+        root_dir = os.path.join(helpers.get_top_directory(), "schedules")
+    file = sys.stdout if file is None else file
+    changed = asyncio.Event()
+    poller = asyncio.create_task(_poll(os.path.join(root_dir, f"{name}.lock"), changed, poll))
+    screen = []
+    table = []
+    day = None
+    file.write("\033[2J" + HIDE_CURSOR)
+    try:
+        while True:
+            now = helpers.now()
+            if changed.is_set() or now.date() != day:  # new day may start a new period
+                changed.clear()
+                schedule.load(name, root_dir)
+                table = schedule.overview(cell_length).splitlines()
+                day = now.date()
+            lines = [status_line(now), ""] + table
+            file.write(redraw(screen, lines))
+            file.flush()
+            screen = lines
+            try:
+                await asyncio.wait_for(changed.wait(), timeout=tick)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        poller.cancel()
+        file.write(f"\033[{len(screen) + 1};1H" + SHOW_CURSOR)
+        file.flush()